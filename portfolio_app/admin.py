@@ -1,10 +1,11 @@
 # admin.py
 from django.contrib import admin
-from .models import User, Portfolio, Stock,News, StockLot, Transaction
+from .models import User, Portfolio, Position, Stock,News, StockLot, Transaction
 
 @admin.register(Stock)
 class StockAdmin(admin.ModelAdmin):
-    list_display = ('symbol', 'name', 'price', 'sector')
+    list_display = ('symbol', 'name', 'price', 'sector', 'listed')
+    list_filter = ('listed',)
     search_fields = ('symbol', 'name')
 
 @admin.register(StockLot)
@@ -12,6 +13,11 @@ class StockLotAdmin(admin.ModelAdmin):
     list_display = ('stock', 'portfolio', 'purchase_date', 'purchase_price', 'quantity', 'remaining_quantity')
     list_filter = ('stock', 'portfolio', 'purchase_date')
 
+@admin.register(Position)
+class PositionAdmin(admin.ModelAdmin):
+    list_display = ('stock', 'portfolio', 'shares', 'total_cost', 'last_updated')
+    list_filter = ('stock', 'portfolio')
+
 @admin.register(Portfolio)
 class PortfolioAdmin(admin.ModelAdmin):
     list_display = ('id', 'totalValue', 'last_updated')
@@ -31,4 +37,10 @@ class NewsAdmin(admin.ModelAdmin):
     list_display = ('title', 'date', 'created_at')
     list_filter = ('date', 'created_at')
     search_fields = ('title', 'description')
-    date_hierarchy = 'date'
\ No newline at end of file
+    date_hierarchy = 'date'
+
+    def get_search_results(self, request, queryset, search_term):
+        # Full-text search instead of icontains scans over every description
+        if not search_term:
+            return queryset, False
+        return queryset.search(search_term), False
@@ -0,0 +1,177 @@
+# portfolio_app/async_views.py
+"""Async versions of the hottest read endpoints, and the price stream, for the ASGI application.
+
+Served under /api/async/; the read endpoints return the same bodies as their
+DRF counterparts. Under ASGI a request waiting on the database or the quote cache
+yields the event loop instead of holding a worker thread. Like the rest of the
+API they use the project's AllowAny permission, so DRF's per-request
+authentication is not repeated here.
+"""
+import asyncio
+import json
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework.request import Request
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import Portfolio
+from .pubsub import PRICE_CHANNEL, get_broker
+from .quotes import quote_cache
+from .serializers import NewsSerializer
+from .views import filter_news, filter_stocks, news_paginator, positions_response
+
+
+def json_response(data, status=200):
+    # DRF's encoder, so Decimals and dates render exactly as in the sync API
+    return JsonResponse(data, status=status, safe=False, encoder=JSONEncoder)
+
+
+def not_found(message):
+    return json_response({'error': message}, status=404)
+
+
+@require_GET
+async def stock_list(request):
+    try:
+        return json_response(filter_stocks(await quote_cache.aall(), request.GET))
+    except ValueError as e:
+        return json_response({'error': str(e)}, status=400)
+
+
+@require_GET
+async def stock_detail(request, pk):
+    quote = await quote_cache.aget(pk)
+    if quote is None:
+        return not_found('Stock not found')
+    return json_response(quote)
+
+
+@require_GET
+async def quote_detail(request, symbol):
+    quote = await quote_cache.aget_by_symbol(symbol)
+    if quote is None:
+        return not_found('Stock not found')
+    return json_response(quote)
+
+
+@require_GET
+async def portfolio_positions(request, pk):
+    try:
+        portfolio = await Portfolio.objects.aget(pk=pk)
+    except Portfolio.DoesNotExist:
+        return not_found('Portfolio not found')
+    include_lots = request.GET.get('include_lots', '').lower() in ('1', 'true')
+    positions = await portfolio.aget_positions(include_lots=include_lots)
+    return json_response(positions_response(portfolio, positions))
+
+
+@require_GET
+async def news_list(request):
+    # The keyset paginator reads query_params and builds absolute cursor URLs
+    request = Request(request)
+    paginator = news_paginator(request.query_params)
+    page = await paginator.apaginate_queryset(filter_news(request.query_params), request)
+    return json_response(paginator.get_paginated_data(NewsSerializer(page, many=True).data))
+
+
+# Longest coalescing window a client may ask for, in seconds
+MAX_STREAM_INTERVAL = 60
+
+
+def sse_event(event, data, event_id=None):
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', f'data: {json.dumps(data, cls=JSONEncoder)}']
+    return '\n'.join(lines) + '\n\n'
+
+
+async def price_events(symbols, interval, keepalive):
+    """Server-sent events: a snapshot, then coalesced price deltas as they are published.
+
+    Deltas received while waiting out ``interval`` are merged per symbol, keeping
+    the latest price and the earliest previous price, so a slow client gets one
+    event per window however fast the feed ticks.
+    """
+    pending = {}
+    latest = {'version': None}
+    ready = asyncio.Event()
+    subscribed = asyncio.Event()
+
+    async def collect():
+        async for message in get_broker().subscribe(PRICE_CHANNEL, ready=subscribed):
+            for symbol, delta in message['prices'].items():
+                if symbols is not None and symbol not in symbols:
+                    continue
+                if symbol in pending:
+                    delta = {**delta, 'previous': pending[symbol]['previous']}
+                pending[symbol] = delta
+            latest['version'] = message['version']
+            if pending:
+                ready.set()
+
+    collector = asyncio.create_task(collect())
+    try:
+        # Take the snapshot only once the subscription is live, so no tick falls in between
+        waiter = asyncio.ensure_future(subscribed.wait())
+        try:
+            await asyncio.wait({collector, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        if not subscribed.is_set():
+            # Surface broker failures; EventSource clients reconnect
+            collector.result()
+            return
+        quotes = await quote_cache.aall()
+        yield sse_event('snapshot', {
+            'version': quote_cache.stats()['version'],
+            'prices': {
+                quote['symbol']: {'price': quote['price']}
+                for quote in quotes if symbols is None or quote['symbol'] in symbols
+            },
+        })
+
+        while True:
+            try:
+                await asyncio.wait_for(ready.wait(), keepalive)
+            except asyncio.TimeoutError:
+                if collector.done():
+                    # Surface broker failures; EventSource clients reconnect
+                    collector.result()
+                    return
+                yield ': keepalive\n\n'
+                continue
+            ready.clear()
+            deltas = dict(pending)
+            pending.clear()
+            yield sse_event('prices', {'version': latest['version'], 'prices': deltas},
+                            event_id=latest['version'])
+            await asyncio.sleep(interval)
+    finally:
+        collector.cancel()
+
+
+@require_GET
+async def price_stream(request):
+    """Price deltas pushed as Server-Sent Events; needs the ASGI application.
+
+    ``?symbols=A,B`` limits the stream to those symbols and ``?interval=`` sets
+    the coalescing window in seconds.
+    """
+    config = getattr(settings, 'PRICE_STREAM', {})
+    symbols = request.GET.get('symbols')
+    symbols = {symbol.strip() for symbol in symbols.split(',') if symbol.strip()} if symbols else None
+    try:
+        interval = float(request.GET.get('interval', config.get('COALESCE_INTERVAL', 1.0)))
+    except ValueError:
+        return json_response({'error': 'interval must be a number of seconds'}, status=400)
+    interval = min(max(interval, 0), MAX_STREAM_INTERVAL)
+
+    response = StreamingHttpResponse(
+        price_events(symbols, interval, config.get('KEEPALIVE', 15)),
+        content_type='text/event-stream'
+    )
+    response['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response['X-Accel-Buffering'] = 'no'
+    return response
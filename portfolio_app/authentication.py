@@ -0,0 +1,167 @@
+# portfolio_app/authentication.py
+import threading
+import time
+
+import jwt
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+
+# Local entries kept before expired ones are swept
+_MAX_LOCAL_ENTRIES = 10000
+
+
+def auth_config():
+    return getattr(settings, 'TOKEN_AUTH', {})
+
+
+class TokenPrincipal:
+    """Minimal authenticated user built from verified token claims"""
+
+    is_authenticated = True
+    is_anonymous = False
+    is_active = True
+
+    def __init__(self, id, username, portfolio_id, session_id, expires_at):
+        self.id = id
+        self.username = username
+        self.portfolio_id = portfolio_id
+        self.session_id = session_id
+        self.expires_at = expires_at
+
+    @property
+    def pk(self):
+        return self.id
+
+    def get_username(self):
+        return self.username
+
+    def __str__(self):
+        return self.username or str(self.id)
+
+
+class RevocationStore:
+    """Revoked login sessions, checked in O(1) on every request.
+
+    Revocations are written to a shared cache alias (Redis in production) with a
+    timeout equal to the token's remaining lifetime, so they expire with it.
+    Each process remembers revoked sessions locally, and remembers a session as
+    not revoked for ``REVOCATION_CHECK_TTL`` seconds, so at most one cache read
+    per session per interval reaches the shared backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._revoked = {}
+            self._checked = {}
+
+    @property
+    def backend(self):
+        return caches[auth_config().get('CACHE_ALIAS', 'default')]
+
+    def _key(self, session_id):
+        return f'revoked:{session_id}'
+
+    def revoke(self, session_id, expires_at):
+        """Revoke ``session_id`` until ``expires_at`` (a Unix timestamp)"""
+        timeout = max(1, int(expires_at - time.time()) + 1)
+        self.backend.set(self._key(session_id), True, timeout)
+        with self._lock:
+            self._revoked[session_id] = expires_at
+            self._checked.pop(session_id, None)
+
+    def is_revoked(self, session_id, expires_at):
+        now = time.time()
+        with self._lock:
+            if session_id in self._revoked:
+                return True
+            checked_at = self._checked.get(session_id)
+        if checked_at is not None and time.monotonic() - checked_at < auth_config().get('REVOCATION_CHECK_TTL', 1.0):
+            return False
+
+        revoked = self.backend.get(self._key(session_id)) is not None
+        with self._lock:
+            if len(self._revoked) + len(self._checked) > _MAX_LOCAL_ENTRIES:
+                self._sweep(now)
+            if revoked:
+                self._revoked[session_id] = expires_at
+            else:
+                self._checked[session_id] = time.monotonic()
+        return revoked
+
+    def _sweep(self, now):
+        self._revoked = {key: expires for key, expires in self._revoked.items() if expires > now}
+        self._checked = {}
+
+
+revocations = RevocationStore()
+
+
+class CachedJWTAuthentication(BaseAuthentication):
+    """Authenticates the access tokens issued by LoginView/RegisterView without a database hit.
+
+    The signature and expiry are verified and the user is taken from the token
+    claims; verified principals are cached per token for ``PRINCIPAL_TTL``
+    seconds, so repeat requests skip decoding too. Revocation by LogoutView is
+    still honoured through the RevocationStore.
+    """
+
+    keyword = b'bearer'
+
+    # Shared by the per-request instances DRF creates: token -> (principal, valid until)
+    _principals = {}
+
+    def authenticate(self, request):
+        header = get_authorization_header(request).split()
+        if not header or header[0].lower() != self.keyword:
+            return None
+        if len(header) != 2:
+            raise AuthenticationFailed('Invalid Authorization header')
+        token = header[1].decode('latin-1')
+
+        now = time.time()
+        cached = self._principals.get(token)
+        if cached is not None and cached[1] > now:
+            principal = cached[0]
+        else:
+            principal = self.load_principal(token)
+            ttl = auth_config().get('PRINCIPAL_TTL', 60)
+            if len(self._principals) > _MAX_LOCAL_ENTRIES:
+                self._principals.clear()
+            self._principals[token] = (principal, min(now + ttl, principal.expires_at))
+
+        if principal.session_id is not None and revocations.is_revoked(principal.session_id, principal.expires_at):
+            raise AuthenticationFailed('Token has been revoked')
+        return principal, token
+
+    def load_principal(self, token):
+        try:
+            claims = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])
+        except jwt.PyJWTError:
+            raise AuthenticationFailed('Invalid or expired token')
+        if claims.get('type') != 'access' or 'user_id' not in claims:
+            raise AuthenticationFailed('Not an access token')
+
+        if 'username' not in claims:
+            # Tokens issued before the claims were added: look the user up once
+            from .models import User
+            user = User.objects.filter(pk=claims['user_id']).values('username', 'portfolio_id').first()
+            if user is None:
+                raise AuthenticationFailed('User not found')
+            claims.update(user)
+
+        return TokenPrincipal(
+            id=claims['user_id'],
+            username=claims['username'],
+            portfolio_id=claims.get('portfolio_id'),
+            session_id=claims.get('sid'),
+            expires_at=claims['exp'],
+        )
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
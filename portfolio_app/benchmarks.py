@@ -0,0 +1,249 @@
+# portfolio_app/benchmarks.py
+"""Synthetic fixtures and timed cases for the trading and valuation hot paths.
+
+Run through ``manage.py benchmark``, which builds the fixtures inside a
+transaction that is rolled back afterwards, so it is safe against a local
+database that already holds data.
+"""
+import io
+import json
+import os
+import random
+import statistics
+import tempfile
+import time
+from decimal import Decimal
+
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from .models import Portfolio, Position, Stock, StockLot, Transaction, User
+from .quotes import quote_cache
+from .serializers import PortfolioSerializer, TransactionSerializer
+
+# Fixture sizes; every case runs against the same generated data
+SCALES = {
+    'small': {'users': 20, 'stocks': 50, 'max_holdings': 8, 'max_lots': 50, 'news': 2000},
+    'medium': {'users': 200, 'stocks': 200, 'max_holdings': 20, 'max_lots': 200, 'news': 20000},
+    'large': {'users': 2000, 'stocks': 500, 'max_holdings': 40, 'max_lots': 500, 'news': 200000},
+}
+
+
+def lot_count(rng, max_lots):
+    """Lots per holding: most positions are a few buys, a long tail is hundreds"""
+    return min(max_lots, int(rng.paretovariate(1.2)))
+
+
+class BenchmarkData:
+    """Users with portfolios holding stocks through many lots, plus feed and news files"""
+
+    def __init__(self, users, stocks, max_holdings, max_lots, news, seed=0):
+        self.rng = random.Random(seed)
+        self.sizes = {'users': users, 'stocks': stocks, 'max_holdings': max_holdings,
+                      'max_lots': max_lots, 'news': news}
+        self.stocks = self.make_stocks(stocks)
+        self.portfolios = self.make_portfolios(users, max_holdings, max_lots)
+        self.feed_path = self.make_feed_file()
+        self.news_path = self.make_news_file(news)
+
+        # The portfolio holding the most lots of one stock exercises the deep FIFO paths
+        deepest = (
+            StockLot.objects.open().values('portfolio_id', 'stock_id')
+            .annotate(lots=Count('id')).order_by('-lots').first()
+        )
+        self.deep_portfolio = Portfolio.objects.get(pk=deepest['portfolio_id'])
+        self.deep_stock = Stock.objects.get(pk=deepest['stock_id'])
+        self.deep_shares = Position.objects.get(portfolio=self.deep_portfolio, stock=self.deep_stock).shares
+        self.sizes['deepest_lots'] = deepest['lots']
+
+    def make_stocks(self, count):
+        return Stock.objects.bulk_create([
+            Stock(symbol=f'BM{i:04d}', name=f'Benchmark {i}',
+                  price=Decimal(self.rng.randint(100, 20000)) / 100, sector='Benchmark')
+            for i in range(count)
+        ])
+
+    def make_portfolios(self, count, max_holdings, max_lots):
+        portfolios = Portfolio.objects.bulk_create([
+            Portfolio(cash_balance=Decimal('100000000'), totalValue=Decimal('100000000'))
+            for _ in range(count)
+        ])
+        users = User.objects.bulk_create([
+            User(username=f'bench{portfolio.id}', email=f'bench{portfolio.id}@example.com',
+                 password='benchmark', language='fr', portfolio=portfolio)
+            for portfolio in portfolios
+        ])
+
+        lots = []
+        for portfolio in portfolios:
+            for stock in self.rng.sample(self.stocks, self.rng.randint(1, max_holdings)):
+                for _ in range(lot_count(self.rng, max_lots)):
+                    quantity = self.rng.randint(1, 100)
+                    # A third of older lots are already partly or fully sold
+                    remaining = quantity if self.rng.random() > 0.33 else self.rng.randint(0, quantity)
+                    lots.append(StockLot(
+                        portfolio=portfolio, stock=stock, quantity=quantity, remaining_quantity=remaining,
+                        purchase_price=(stock.price * Decimal(self.rng.uniform(0.5, 1.5))).quantize(Decimal('0.01'))
+                    ))
+        lots = StockLot.objects.bulk_create(lots, batch_size=2000)
+
+        user_by_portfolio = {user.portfolio_id: user for user in users}
+        Transaction.objects.bulk_create([
+            Transaction(user=user_by_portfolio[lot.portfolio_id], type='BUY', stock=lot.stock,
+                        quantity=lot.quantity, price=lot.purchase_price, lot=lot)
+            for lot in lots
+        ], batch_size=2000)
+        call_command('rebuild_positions', stdout=io.StringIO())
+        return portfolios
+
+    def make_feed_file(self):
+        """A price feed payload (data.irbe7.com format) moving every stock"""
+        feed = [
+            {'referentiel': {'ticker': stock.symbol, 'stockName': stock.name,
+                             'last': float(stock.price) * self.rng.uniform(0.95, 1.05)}}
+            for stock in self.stocks
+        ]
+        file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False, encoding='utf-8')
+        with file:
+            json.dump(feed, file)
+        return file.name
+
+    def make_news_file(self, count):
+        file = tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False, encoding='utf-8')
+        with file:
+            for i in range(count):
+                file.write(json.dumps({
+                    'title': f'Benchmark news {i}',
+                    'date': f'{1 + i % 28:02d}/{1 + i % 12:02d}/{2023 + i % 3}',
+                    'description': 'Lorem ipsum dolor sit amet ' * 10,
+                }) + '\n')
+        return file.name
+
+    def cleanup(self):
+        os.unlink(self.feed_path)
+        os.unlink(self.news_path)
+
+
+CASES = {}
+
+
+def case(name):
+    """Register a benchmark: ``setup(data)`` returns the callable to time"""
+    def register(setup):
+        CASES[name] = setup
+        return setup
+    return register
+
+
+@case('calculate_position')
+def calculate_position(data):
+    return lambda: data.deep_portfolio.calculate_position(data.deep_stock)
+
+
+@case('calculate_total_value')
+def calculate_total_value(data):
+    return data.deep_portfolio.calculate_total_value
+
+
+@case('buy_stock')
+def buy_stock(data):
+    portfolio = Portfolio.objects.get(pk=data.deep_portfolio.pk)
+    return lambda: portfolio.buy_stock(data.deep_stock, 10, data.deep_stock.price)
+
+
+@case('sell_stock_many_lots')
+def sell_stock_many_lots(data):
+    portfolio = Portfolio.objects.get(pk=data.deep_portfolio.pk)
+    # Consume every open lot of the deepest holding
+    return lambda: portfolio.sell_stock(data.deep_stock, data.deep_shares, data.deep_stock.price)
+
+
+@case('positions_endpoint')
+def positions_endpoint(data):
+    client = APIClient()
+    url = f'/api/portfolios/{data.deep_portfolio.pk}/positions/?include_lots=true'
+
+    def run():
+        response = client.get(url)
+        assert response.status_code == 200, response.status_code
+    return run
+
+
+@case('portfolio_serializer')
+def portfolio_serializer(data):
+    return lambda: PortfolioSerializer(Portfolio.objects.get(pk=data.deep_portfolio.pk)).data
+
+
+@case('transaction_serializer')
+def transaction_serializer(data):
+    return lambda: TransactionSerializer(
+        Transaction.objects.select_related('lot').order_by('-date', '-id')[:500], many=True
+    ).data
+
+
+@case('update_stock_prices_task')
+def update_stock_prices_task(data):
+    from .task import update_stock_prices_task as task
+    return lambda: task(data.feed_path)
+
+
+@case('import_news')
+def import_news(data):
+    return lambda: call_command('import_news', data.news_path, stdout=io.StringIO())
+
+
+def run_case(setup, data, repeat):
+    """Time ``repeat`` runs, each rolled back to a savepoint so state never drifts.
+
+    An untimed first run warms caches and counts the queries issued.
+    """
+    run = setup(data)
+    timings = []
+    queries = None
+    for _ in range(repeat + 1):
+        savepoint = transaction.savepoint()
+        try:
+            if queries is None:
+                with CaptureQueriesContext(connection) as context:
+                    run()
+                queries = len(context)
+                continue
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        finally:
+            transaction.savepoint_rollback(savepoint)
+    timings.sort()
+    return {
+        'median': statistics.median(timings),
+        'p95': timings[min(len(timings) - 1, int(0.95 * len(timings)))],
+        'min': timings[0],
+        'queries': queries,
+        'runs': repeat,
+    }
+
+
+def run_suite(data, names, repeat):
+    results = {}
+    for name in names:
+        quote_cache.reset()
+        quote_cache.publish()
+        results[name] = run_case(CASES[name], data, repeat)
+    return results
+
+
+def compare(results, baseline, threshold):
+    """(name, metric, baseline, current) for cases slower or chattier than the baseline"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current['median'] > previous['median'] * (1 + threshold):
+            regressions.append((name, 'median', previous['median'], current['median']))
+        if previous.get('queries') is not None and current['queries'] > previous['queries']:
+            regressions.append((name, 'queries', previous['queries'], current['queries']))
+    return regressions
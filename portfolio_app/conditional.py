@@ -0,0 +1,36 @@
+# portfolio_app/conditional.py
+from functools import wraps
+
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+
+
+def conditional(validators):
+    """Answer GET/HEAD with 304 Not Modified while the resource is unchanged.
+
+    ``validators(view, request, *args, **kwargs)`` returns ``(etag, last_modified)``
+    from a cheap lookup (either may be None). It runs before the wrapped view, so a
+    matching ``If-None-Match``/``If-Modified-Since`` skips the main query and the
+    serializer entirely.
+    """
+    def decorator(view_method):
+        @wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            etag, last_modified = validators(self, request, *args, **kwargs)
+            etag = quote_etag(etag) if etag is not None else None
+            timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = view_method(self, request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+            if etag is not None:
+                response.headers.setdefault('ETag', etag)
+            if timestamp is not None:
+                response.headers.setdefault('Last-Modified', http_date(timestamp))
+            # Let clients keep the body but always revalidate it
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
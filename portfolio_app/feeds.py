@@ -0,0 +1,100 @@
+# portfolio_app/feeds.py
+import json
+import os
+from decimal import Decimal, InvalidOperation
+
+import requests
+from requests.adapters import HTTPAdapter
+from django.conf import settings
+from django.utils.http import http_date
+from django.utils.module_loading import import_string
+
+DEFAULT_FEED_URL = "https://data.irbe7.com/api/data/principaux"
+
+_session = None
+
+
+def get_session():
+    """Process-wide requests session so upstream connections are pooled"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        _session.mount('https://', adapter)
+        _session.mount('http://', adapter)
+    return _session
+
+
+class HttpFeed:
+    """Market data feed fetched over HTTP (data.irbe7.com by default)"""
+
+    def __init__(self, url=DEFAULT_FEED_URL, timeout=(3.05, 10)):
+        self.url = url
+        self.timeout = tuple(timeout) if isinstance(timeout, list) else timeout
+
+    def fetch(self):
+        response = get_session().get(self.url, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def fetch_if_changed(self, validators=None):
+        """(payload, validators), with a None payload when the upstream answers 304"""
+        validators = validators or {}
+        headers = {}
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+
+        response = get_session().get(self.url, timeout=self.timeout, headers=headers)
+        if response.status_code == 304:
+            return None, validators
+        response.raise_for_status()
+        return response.json(), {
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+        }
+
+
+class JsonFileFeed:
+    """Market data feed read from a local JSON file, for tests and benchmarks"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def fetch(self):
+        with open(self.path, 'r', encoding='utf-8-sig') as file:
+            return json.load(file)
+
+    def fetch_if_changed(self, validators=None):
+        """(payload, validators), with a None payload while the file is unmodified"""
+        last_modified = http_date(os.stat(self.path).st_mtime)
+        if validators and validators.get('last_modified') == last_modified:
+            return None, validators
+        return self.fetch(), {'last_modified': last_modified}
+
+
+def get_feed(source=None):
+    """Return the configured feed, or one built from an explicit URL or file path"""
+    if source is not None:
+        if source.startswith(('http://', 'https://')):
+            return HttpFeed(url=source)
+        return JsonFileFeed(source)
+
+    config = getattr(settings, 'STOCK_FEED', {})
+    backend = import_string(config.get('BACKEND', 'portfolio_app.feeds.HttpFeed'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+def parse_quote(item):
+    """Extract (symbol, name, price) from a feed item, or None if it is malformed"""
+    try:
+        referentiel = item['referentiel']
+        symbol = referentiel['ticker']
+        last = referentiel['last'] if 'last' in referentiel else item['last']
+        price = Decimal(str(last)).quantize(Decimal('0.01'))
+    except (KeyError, TypeError, InvalidOperation):
+        return None
+    if not price.is_finite():
+        return None
+    return symbol, referentiel.get('stockName'), price
@@ -0,0 +1,113 @@
+import json
+import platform
+import time
+
+import django
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test.utils import override_settings
+
+from portfolio_app.benchmarks import CASES, SCALES, BenchmarkData, compare, run_suite
+from stock_portfolio_project.celery import app as celery_app
+
+# Benchmarks measure the application code, not Redis or the Celery broker
+ISOLATED_SETTINGS = {
+    'CACHES': {
+        'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+        'quotes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-quotes'},
+        'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark-auth'},
+    },
+    'PRICE_STREAM': {'BACKEND': 'portfolio_app.pubsub.InMemoryBroker'},
+    'DATABASE_ROUTING': {'REPLICAS': []},
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the trading and valuation hot paths against synthetic data in the configured "
+        "database (rolled back afterwards). Writes JSON results and can flag regressions "
+        "against a stored baseline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', choices=list(SCALES), default='small', help='Fixture size (default small)')
+        parser.add_argument('--repeat', type=int, default=10, help='Timed runs per case (default 10)')
+        parser.add_argument(
+            '--case', action='append', dest='cases', choices=list(CASES),
+            help='Case to run, may be repeated (default: all)',
+        )
+        parser.add_argument('--seed', type=int, default=0, help='Random seed for the fixtures')
+        parser.add_argument('--output', help='Write results as JSON to this file')
+        parser.add_argument('--compare', metavar='BASELINE', help='JSON results of an earlier run to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed median slowdown before a case is flagged (default 0.2 = 20%%)',
+        )
+
+    def handle(self, *args, **options):
+        if options['repeat'] <= 0:
+            raise CommandError('--repeat must be positive')
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as file:
+                    baseline = json.load(file)['results']
+            except (OSError, ValueError, KeyError) as e:
+                raise CommandError(f"Could not read baseline {options['compare']}: {e}")
+
+        names = options['cases'] or list(CASES)
+        # Run revalue_portfolios_task inline, without reaching for the real broker
+        celery = {key: celery_app.conf[key] for key in ('task_always_eager', 'broker_write_url')}
+        celery_app.conf.update(task_always_eager=True, broker_write_url='memory://')
+        try:
+            with override_settings(**ISOLATED_SETTINGS), transaction.atomic():
+                started = time.perf_counter()
+                data = BenchmarkData(seed=options['seed'], **SCALES[options['scale']])
+                self.stdout.write(
+                    f"Fixtures built in {time.perf_counter() - started:.1f}s: "
+                    + ', '.join(f'{key}={value}' for key, value in data.sizes.items())
+                )
+                try:
+                    results = run_suite(data, names, options['repeat'])
+                finally:
+                    data.cleanup()
+                    transaction.set_rollback(True)
+        finally:
+            celery_app.conf.update(celery)
+
+        report = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+                'database': connection.vendor,
+                'scale': options['scale'],
+                'sizes': data.sizes,
+                'repeat': options['repeat'],
+                'python': platform.python_version(),
+                'django': django.get_version(),
+            },
+            'results': results,
+        }
+        self.print_results(results, baseline)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        if baseline is not None:
+            regressions = compare(results, baseline, options['threshold'])
+            for name, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(f"REGRESSION {name}: {metric} {before:.4g} -> {after:.4g}"))
+            if regressions:
+                raise CommandError(f"{len(regressions)} regression(s) against {options['compare']}")
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {options['compare']}"))
+
+    def print_results(self, results, baseline):
+        self.stdout.write(f"{'case':<26} {'median ms':>10} {'p95 ms':>9} {'min ms':>9} {'queries':>8} {'vs base':>8}")
+        for name, result in results.items():
+            change = ''
+            if baseline and name in baseline:
+                change = f"{result['median'] / baseline[name]['median'] - 1:+.0%}"
+            self.stdout.write(
+                f"{name:<26} {result['median'] * 1000:>10.2f} {result['p95'] * 1000:>9.2f} "
+                f"{result['min'] * 1000:>9.2f} {result['queries']:>8} {change:>8}"
+            )
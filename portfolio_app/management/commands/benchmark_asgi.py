@@ -0,0 +1,168 @@
+import asyncio
+import io
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.wsgi import get_wsgi_application
+
+from portfolio_app.models import Portfolio, Stock
+
+# Sync DRF path and its async counterpart for each benchmarked endpoint
+ENDPOINTS = {
+    'stocks': ('/api/stocks/', '/api/async/stocks/'),
+    'stock': ('/api/stocks/{stock}/', '/api/async/stocks/{stock}/'),
+    'positions': ('/api/portfolios/{portfolio}/positions/', '/api/async/portfolios/{portfolio}/positions/'),
+    'news': ('/api/news/', '/api/async/news/'),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent-request throughput of the sync views through the WSGI "
+        "application against the async views through the ASGI application, in process "
+        "and against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            dest='endpoints',
+            choices=list(ENDPOINTS),
+            help='Endpoint to run, may be repeated (default: all)',
+        )
+        parser.add_argument('--requests', type=int, default=500, help='Requests per endpoint and mode')
+        parser.add_argument('--concurrency', type=int, default=50, help='Requests in flight at once')
+        parser.add_argument('--host', default='localhost', help='Host header (must be in ALLOWED_HOSTS)')
+
+    def handle(self, *args, **options):
+        if options['requests'] <= 0 or options['concurrency'] <= 0:
+            raise CommandError('--requests and --concurrency must be positive')
+        stock = Stock.objects.order_by('id').first()
+        portfolio = Portfolio.objects.filter(positions__shares__gt=0).order_by('id').first()
+        portfolio = portfolio or Portfolio.objects.order_by('id').first()
+        if stock is None or portfolio is None:
+            raise CommandError('Need at least one stock and one portfolio to benchmark')
+
+        self.host = options['host']
+        wsgi = get_wsgi_application()
+        asgi = get_asgi_application()
+        total, concurrency = options['requests'], options['concurrency']
+
+        self.stdout.write(f"{total} requests per run, {concurrency} concurrent")
+        self.stdout.write(f"{'endpoint':<10} {'mode':<5} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        for name in options['endpoints'] or ENDPOINTS:
+            sync_path, async_path = (
+                path.format(stock=stock.id, portfolio=portfolio.id) for path in ENDPOINTS[name]
+            )
+            # Warm the quote cache and connections before measuring
+            self.run_wsgi(wsgi, sync_path, concurrency, concurrency)
+            self.report(name, 'wsgi', *self.run_wsgi(wsgi, sync_path, total, concurrency))
+            asyncio.run(self.run_asgi(asgi, async_path, concurrency, concurrency))
+            self.report(name, 'asgi', *asyncio.run(self.run_asgi(asgi, async_path, total, concurrency)))
+
+    def run_wsgi(self, application, path, total, concurrency):
+        """Threaded, like a WSGI server with ``concurrency`` worker threads"""
+        def request(_):
+            status = []
+            started = time.perf_counter()
+            response = application(self.environ(path), lambda line, headers, exc_info=None: status.append(line))
+            try:
+                b''.join(response)
+            finally:
+                # Fires request_finished, which returns the DB connection
+                response.close()
+            return time.perf_counter() - started, int(status[0].split()[0])
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(request, range(total)))
+        return results, time.perf_counter() - started
+
+    async def run_asgi(self, application, path, total, concurrency):
+        """One event loop with at most ``concurrency`` requests in flight"""
+        slots = asyncio.Semaphore(concurrency)
+
+        async def request():
+            async with slots:
+                started = time.perf_counter()
+                status = await self.asgi_get(application, path)
+                return time.perf_counter() - started, status
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(request() for _ in range(total)))
+        return results, time.perf_counter() - started
+
+    def environ(self, path):
+        path, _, query = path.partition('?')
+        return {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': path,
+            'QUERY_STRING': query,
+            'SCRIPT_NAME': '',
+            'SERVER_NAME': self.host,
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': self.host,
+            'wsgi.input': io.BytesIO(),
+            'wsgi.errors': io.StringIO(),
+            'wsgi.url_scheme': 'http',
+            'wsgi.version': (1, 0),
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+
+    async def asgi_get(self, application, path):
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': 'GET',
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [(b'host', self.host.encode())],
+            'client': ('127.0.0.1', 0),
+            'server': (self.host, 80),
+        }
+        finished = asyncio.Event()
+        received = False
+        status = None
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            # The handler listens for a disconnect while the view runs
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body' and not message.get('more_body'):
+                finished.set()
+
+        await application(scope, receive, send)
+        finished.set()
+        return status
+
+    def report(self, name, mode, results, elapsed):
+        latencies = sorted(latency for latency, _ in results)
+        errors = sum(1 for _, status in results if status != 200)
+
+        def percentile(fraction):
+            return latencies[min(len(latencies) - 1, int(fraction * len(latencies)))] * 1000
+
+        self.stdout.write(
+            f"{name:<10} {mode:<5} {len(results) / elapsed:>9,.0f} {percentile(0.5):>8.1f} "
+            f"{percentile(0.95):>8.1f} {percentile(0.99):>8.1f} {errors:>7}"
+        )
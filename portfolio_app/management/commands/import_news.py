@@ -0,0 +1,168 @@
+import glob
+import multiprocessing
+import os
+import queue
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from portfolio_app.models import News
+from portfolio_app.news_stream import chunked, init_worker, iter_json_items, send_valid_news, validate_news
+
+
+class Command(BaseCommand):
+    help = (
+        "Import JSON Lines (or JSON array) news dumps in batches. A single file is "
+        "streamed; several files, a directory or a glob are parsed in a process pool."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths',
+            nargs='+',
+            help='News dump files, directories of *.jsonl/*.json dumps, or glob patterns',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert (default 1000)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Parser processes for multi-file imports (default: all cores)',
+        )
+
+    def handle(self, *args, **options):
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        paths = self.expand_paths(options['paths'])
+        started = time.perf_counter()
+        stats = Counter()
+        existing = News.objects.count()
+
+        try:
+            if len(paths) == 1 or options['workers'] <= 1:
+                for path in paths:
+                    self.import_stream(path, options['batch_size'], stats)
+            else:
+                self.import_parallel(paths, options['batch_size'], options['workers'], stats)
+        except FileNotFoundError as e:
+            raise CommandError(f"Could not find file at {e.filename}")
+        except ValueError as e:
+            raise CommandError(f"Invalid JSON: {e}")
+
+        elapsed = time.perf_counter() - started
+        imported = News.objects.count() - existing
+        self.report(stats, imported, elapsed)
+
+    def expand_paths(self, patterns):
+        paths = []
+        for pattern in patterns:
+            if os.path.isdir(pattern):
+                matches = glob.glob(os.path.join(pattern, '*.jsonl')) + glob.glob(os.path.join(pattern, '*.json'))
+            elif glob.has_magic(pattern):
+                matches = glob.glob(pattern)
+            else:
+                matches = [pattern]
+            paths.extend(sorted(matches))
+        if not paths:
+            raise CommandError('No news dumps matched')
+        # The same file named twice would only produce duplicates
+        return list(dict.fromkeys(paths))
+
+    def import_stream(self, path, batch_size, stats):
+        """Stream one file straight into batched inserts with flat memory use"""
+        with open(path, 'r', encoding='utf-8-sig') as file:
+            valid = validate_news(iter_json_items(file), stats)
+            for batch in chunked(valid, batch_size):
+                self.write(batch, stats)
+        stats['files'] += 1
+
+    def import_parallel(self, paths, batch_size, workers, stats):
+        """Parse files in a process pool and funnel deduplicated rows to this single writer.
+
+        Workers send each batch as soon as it is parsed, through a bounded
+        queue, so neither side ever holds a whole file.
+        """
+        workers = min(workers, len(paths))
+        results = multiprocessing.Queue(maxsize=workers * 2)
+        seen = {}
+        error = None
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_worker, initargs=(results,)) as pool:
+            futures = {path: pool.submit(send_valid_news, path, batch_size) for path in paths}
+            counts = Counter()
+            remaining = len(paths)
+            while remaining:
+                try:
+                    path, file_stats, rows = results.get(timeout=1)
+                except queue.Empty:
+                    if all(future.done() for future in futures.values()):
+                        # A worker died before reporting back
+                        for future in futures.values():
+                            future.result()
+                    continue
+
+                if rows is None:
+                    remaining -= 1
+                    if futures[path].exception() is not None:
+                        # Keep draining so the other workers never block on a full queue
+                        error = error or futures[path].exception()
+                        continue
+                    stats.update(file_stats)
+                    self.stdout.write(
+                        f"Parsed {path}: {file_stats['valid']} valid, {counts[path]} new to this run"
+                    )
+                    continue
+                if error:
+                    continue
+
+                # Drop rows already seen in this run before touching the database
+                fresh = []
+                for title, date, description in rows:
+                    key = (title, date)
+                    first_seen = seen.get(key)
+                    if first_seen is None:
+                        seen[key] = path
+                        fresh.append({'title': title, 'date': date, 'description': description})
+                    elif first_seen == path:
+                        stats['duplicates_in_file'] += 1
+                    else:
+                        stats['duplicates_across_files'] += 1
+                if fresh:
+                    self.write(fresh, stats)
+                    counts[path] += len(fresh)
+        if error:
+            raise error
+
+    def write(self, batch, stats):
+        # Rows already present hit the (title, date) constraint and are skipped
+        News.objects.bulk_create([News(**item) for item in batch], ignore_conflicts=True)
+        # Bulk inserts skip the News signals
+        News.mark_changed()
+        stats['batches'] += 1
+
+    def report(self, stats, imported, elapsed):
+        rate = stats['read'] / elapsed if elapsed else 0
+        self.stdout.write("Processing complete:")
+        self.stdout.write(f"- {stats['files']} files, {stats['read']} items read, {stats['valid']} valid")
+        self.stdout.write(f"- {imported} new items imported in {stats['batches']} batches")
+        if stats['duplicates_in_file']:
+            self.stdout.write(f"- {stats['duplicates_in_file']} items repeated within a file")
+        if stats['duplicates_across_files']:
+            self.stdout.write(f"- {stats['duplicates_across_files']} items duplicated across files")
+        duplicates = stats['duplicates_in_file'] + stats['duplicates_across_files']
+        self.stdout.write(
+            f"- {stats['valid'] - duplicates - imported} items skipped (already existed)"
+        )
+        for reason in ('missing_fields', 'invalid_type', 'invalid_date', 'before_cutoff', 'title_too_long'):
+            if stats[reason]:
+                self.stdout.write(f"- {stats[reason]} items rejected ({reason.replace('_', ' ')})")
+        self.stdout.write(self.style.SUCCESS(
+            f"Finished in {elapsed:.2f}s ({rate:,.0f} items/s)"
+        ))
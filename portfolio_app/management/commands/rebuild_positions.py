@@ -0,0 +1,67 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from portfolio_app.models import Position, StockLot
+
+
+class Command(BaseCommand):
+    help = "Rebuild (or verify) the materialized Position table from open StockLots"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Only compare Position rows against StockLot, without writing',
+        )
+        parser.add_argument(
+            '--portfolio',
+            type=int,
+            help='Restrict to a single portfolio id',
+        )
+
+    def handle(self, *args, **options):
+        lots = StockLot.objects.open()
+        positions = Position.objects.all()
+        if options['portfolio'] is not None:
+            lots = lots.filter(portfolio_id=options['portfolio'])
+            positions = positions.filter(portfolio_id=options['portfolio'])
+
+        expected = {
+            (row['portfolio_id'], row['stock_id']): (row['shares'], row['total_cost'])
+            for row in lots.positions()
+        }
+
+        if options['verify']:
+            actual = {
+                (row['portfolio_id'], row['stock_id']): (row['shares'], row['total_cost'])
+                for row in positions.values('portfolio_id', 'stock_id', 'shares', 'total_cost')
+            }
+            mismatches = [
+                (key, expected.get(key), actual.get(key))
+                for key in expected.keys() | actual.keys()
+                if expected.get(key) != actual.get(key)
+            ]
+            for (portfolio_id, stock_id), want, got in sorted(mismatches):
+                self.stdout.write(
+                    f"Portfolio {portfolio_id}, stock {stock_id}: expected {want}, found {got}"
+                )
+            if mismatches:
+                raise CommandError(f"{len(mismatches)} position(s) out of sync with StockLot")
+            self.stdout.write(self.style.SUCCESS(f"All {len(expected)} positions match StockLot"))
+            return
+
+        with transaction.atomic():
+            deleted, _ = positions.delete()
+            Position.objects.bulk_create([
+                Position(
+                    portfolio_id=portfolio_id,
+                    stock_id=stock_id,
+                    shares=shares,
+                    total_cost=total_cost,
+                )
+                for (portfolio_id, stock_id), (shares, total_cost) in expected.items()
+            ])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {len(expected)} positions (replaced {deleted} existing rows)"
+        ))
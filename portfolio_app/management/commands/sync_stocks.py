@@ -0,0 +1,81 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from portfolio_app.feeds import get_feed, parse_quote
+from portfolio_app.models import Portfolio, Stock
+from portfolio_app.quotes import quote_cache
+from portfolio_app.task import apply_price_updates, publish_price_deltas
+
+SYMBOL_MAX_LENGTH = Stock._meta.get_field('symbol').max_length
+
+
+class Command(BaseCommand):
+    help = (
+        "Upsert the stock universe from the market data feed in one statement: new symbols "
+        "are created, existing ones get the feed's name. Price changes go through the "
+        "regular ingestion path, so they are recorded as ticks and streamed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            help='Feed URL or local JSON file (default: the STOCK_FEED setting)',
+        )
+        parser.add_argument(
+            '--sector',
+            default='Unknown',
+            help='Sector for newly created stocks, which the feed does not provide (default Unknown)',
+        )
+        parser.add_argument(
+            '--mark-delisted',
+            action='store_true',
+            help='Flag stocks missing from the feed as no longer listed',
+        )
+
+    def handle(self, *args, **options):
+        stock_data = get_feed(options['source']).fetch()
+
+        quotes = {}
+        invalid = 0
+        for item in stock_data:
+            quote = parse_quote(item)
+            if quote is None or len(quote[0]) > SYMBOL_MAX_LENGTH:
+                invalid += 1
+                continue
+            symbol, name, price = quote
+            # One row per symbol: the upsert cannot touch the same row twice
+            quotes[symbol] = (name or symbol, price)
+        if not quotes:
+            raise CommandError(f"The feed returned no usable quotes ({invalid} invalid items)")
+
+        with transaction.atomic():
+            existing = set(Stock.objects.filter(symbol__in=quotes).values_list('symbol', flat=True))
+            # Existing rows keep their price here; apply_price_updates changes it below
+            Stock.objects.bulk_create(
+                [
+                    Stock(symbol=symbol, name=name, price=price, sector=options['sector'], listed=True)
+                    for symbol, (name, price) in quotes.items()
+                ],
+                update_conflicts=True,
+                unique_fields=['symbol'],
+                update_fields=['name', 'listed'],
+            )
+            delisted = 0
+            if options['mark_delisted']:
+                delisted = Stock.objects.filter(listed=True).exclude(symbol__in=quotes).update(listed=False)
+
+            prices = apply_price_updates(stock_data)
+            if prices['changed']:
+                Portfolio.revalue_all()
+
+        # Bulk writes skip the Stock signals: republish quotes and notify subscribers by hand
+        version = quote_cache.publish()
+        if prices['changed']:
+            publish_price_deltas(prices, version)
+
+        created = len(quotes) - len(existing)
+        self.stdout.write(self.style.SUCCESS(
+            f"Synced {len(quotes)} stocks: {created} created, {len(existing)} updated "
+            f"({prices['changed']} price changes), {delisted} marked delisted, "
+            f"{invalid} invalid feed items skipped"
+        ))
@@ -0,0 +1,30 @@
+# portfolio_app/market.py
+from datetime import date, time as dt_time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+
+def polling_config():
+    return getattr(settings, 'PRICE_POLLING', {})
+
+
+def in_session(moment=None):
+    """Whether the BVMT is trading at ``moment`` (default now), per PRICE_POLLING"""
+    config = polling_config()
+    local = (moment or timezone.now()).astimezone(ZoneInfo(config.get('TIMEZONE', 'Africa/Tunis')))
+    if local.weekday() not in config.get('TRADING_DAYS', (0, 1, 2, 3, 4)):
+        return False
+    if local.date() in {date.fromisoformat(day) for day in config.get('HOLIDAYS', ())}:
+        return False
+    opens, closes = (dt_time.fromisoformat(value) for value in config.get('SESSION', ('09:00', '14:30')))
+    return opens <= local.time() < closes
+
+
+def poll_interval(moment=None):
+    """Seconds between feed polls: SESSION_INTERVAL while trading, IDLE_INTERVAL otherwise"""
+    config = polling_config()
+    if in_session(moment):
+        return config.get('SESSION_INTERVAL', 30)
+    return config.get('IDLE_INTERVAL', 3600)
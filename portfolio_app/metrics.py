@@ -0,0 +1,289 @@
+# portfolio_app/metrics.py
+"""Request and task timings: SQL count/time and serializer time, aggregated into histograms.
+
+A ``Timings`` record is bound to a context variable for the duration of a
+request (MetricsMiddleware) or Celery task (signals.py). The query recorder is
+installed on every database connection once, and the context variable follows
+the request into sync_to_async threads, so async views are covered too.
+
+Observations only touch in-process histograms. Every ``FLUSH_INTERVAL``
+seconds each web and Celery process writes a snapshot of them to a shared
+cache alias, and /metrics sums the live snapshots into one Prometheus text
+exposition.
+"""
+import logging
+import os
+import socket
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.cache import caches
+
+# Seconds; also used for SQL and serializer time
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200, 500)
+
+_current = ContextVar('metrics_timings', default=None)
+
+# Cache key listing the per-process snapshot keys
+INDEX_KEY = 'metrics:processes'
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_config():
+    return getattr(settings, 'METRICS', {})
+
+
+class Timings:
+    """What one request or task spent, filled in while it runs"""
+
+    __slots__ = ('started', 'total', 'queries', 'db', 'serialize', '_serializing')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.total = None
+        self.queries = 0
+        self.db = 0.0
+        self.serialize = 0.0
+        self._serializing = False
+
+    def finish(self):
+        self.total = time.perf_counter() - self.started
+        return self
+
+
+@contextmanager
+def record():
+    """Collect query and serializer timings for the enclosed block"""
+    timings = Timings()
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+        timings.finish()
+
+
+def start():
+    """Begin collecting for code that cannot use record(), e.g. Celery signal pairs"""
+    timings = Timings()
+    return timings, _current.set(timings)
+
+
+def stop(timings, token):
+    _current.reset(token)
+    return timings.finish()
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper adding each query to the current Timings"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.queries += 1
+        timings.db += time.perf_counter() - started
+
+
+@contextmanager
+def serializing():
+    """Time serializer output; nested serializers count once, under the outermost"""
+    timings = _current.get()
+    if timings is None or timings._serializing:
+        yield
+        return
+    timings._serializing = True
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.serialize += time.perf_counter() - started
+        timings._serializing = False
+
+
+def server_timing(timings):
+    """Server-Timing header value, durations in milliseconds"""
+    return (
+        f'total;dur={timings.total * 1000:.1f}, '
+        f'db;dur={timings.db * 1000:.1f};desc="{timings.queries} queries", '
+        f'serialize;dur={timings.serialize * 1000:.1f}'
+    )
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        # label values -> [per-bucket counts (+Inf last), sum]
+        self._series = {}
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {labels: [list(counts), total] for labels, (counts, total) in self._series.items()}
+
+    def render(self, series):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for labels, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                le = 'le="%s"' % bound
+                lines.append(f'{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(self.labelnames, labels)} {total}')
+            lines.append(f'{self.name}_count{_labels(self.labelnames, labels)} {cumulative}')
+        return lines
+
+
+REQUEST_LABELS = ('view', 'method', 'status')
+TASK_LABELS = ('task', 'state')
+
+REGISTRY = [
+    Histogram('http_request_duration_seconds', 'Request latency by view', REQUEST_LABELS, LATENCY_BUCKETS),
+    Histogram('http_request_queries', 'SQL queries per request', REQUEST_LABELS, QUERY_BUCKETS),
+    Histogram('http_request_db_seconds', 'SQL time per request', REQUEST_LABELS, LATENCY_BUCKETS),
+    Histogram('http_request_serialize_seconds', 'Serializer time per request', REQUEST_LABELS, LATENCY_BUCKETS),
+    Histogram('celery_task_duration_seconds', 'Task run time', TASK_LABELS, LATENCY_BUCKETS),
+    Histogram('celery_task_queries', 'SQL queries per task run', TASK_LABELS, QUERY_BUCKETS),
+    Histogram('celery_task_db_seconds', 'SQL time per task run', TASK_LABELS, LATENCY_BUCKETS),
+    Histogram('celery_task_serialize_seconds', 'Serializer time per task run', TASK_LABELS, LATENCY_BUCKETS),
+]
+(request_duration, request_queries, request_db, request_serialize,
+ task_duration, task_queries, task_db, task_serialize) = REGISTRY
+
+
+def observe_request(timings, view, method, status):
+    labels = (view, method, str(status))
+    request_duration.observe(timings.total, *labels)
+    request_queries.observe(timings.queries, *labels)
+    request_db.observe(timings.db, *labels)
+    request_serialize.observe(timings.serialize, *labels)
+    maybe_flush()
+
+
+def observe_task(timings, task, state):
+    task_duration.observe(timings.total, task, state)
+    task_queries.observe(timings.queries, task, state)
+    task_db.observe(timings.db, task, state)
+    task_serialize.observe(timings.serialize, task, state)
+    maybe_flush()
+
+
+def snapshot():
+    return {histogram.name: histogram.snapshot() for histogram in REGISTRY}
+
+
+def _backend():
+    return caches[metrics_config().get('CACHE_ALIAS', 'default')]
+
+
+def _process_key():
+    # Evaluated per flush: prefork workers share the parent's module state
+    return f'metrics:{socket.gethostname()}:{os.getpid()}'
+
+
+_flush_lock = threading.Lock()
+_next_flush = 0.0
+
+
+def maybe_flush():
+    global _next_flush
+    now = time.monotonic()
+    if now < _next_flush or not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _next_flush = now + metrics_config().get('FLUSH_INTERVAL', 10)
+        # Runs inside requests and tasks: an unreachable cache must not fail them
+        flush()
+    except Exception:
+        logger.warning('Could not flush metrics to the %r cache', metrics_config().get('CACHE_ALIAS', 'default'),
+                       exc_info=True)
+    finally:
+        _flush_lock.release()
+
+
+def flush():
+    """Publish this process's histograms for /metrics to aggregate"""
+    backend = _backend()
+    key = _process_key()
+    backend.set(key, snapshot(), metrics_config().get('SNAPSHOT_TTL', 300))
+    index = backend.get(INDEX_KEY) or set()
+    if key not in index:
+        # A registration lost to a concurrent writer is retried on the next flush
+        backend.set(INDEX_KEY, index | {key}, None)
+
+
+def collect():
+    """Histograms summed over every process that flushed within SNAPSHOT_TTL"""
+    flush()
+    backend = _backend()
+    index = backend.get(INDEX_KEY) or set()
+    snapshots = backend.get_many(index)
+    if len(snapshots) < len(index):
+        # Processes that stopped flushing have expired
+        backend.set(INDEX_KEY, set(snapshots), None)
+
+    merged = {histogram.name: {} for histogram in REGISTRY}
+    for process in snapshots.values():
+        for name, series in process.items():
+            totals = merged.setdefault(name, {})
+            for labels, (counts, total) in series.items():
+                if labels in totals:
+                    current = totals[labels]
+                    current[0] = [a + b for a, b in zip(current[0], counts)]
+                    current[1] += total
+                else:
+                    totals[labels] = [list(counts), total]
+    return merged
+
+
+def render(merged=None):
+    """Prometheus text exposition of ``merged`` (default: collect())"""
+    if merged is None:
+        merged = collect()
+    lines = []
+    for histogram in REGISTRY:
+        lines.extend(histogram.render(merged.get(histogram.name, {})))
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    """Forget this process's observations (tests)"""
+    global _next_flush
+    for histogram in REGISTRY:
+        histogram.reset()
+    _next_flush = 0.0
@@ -0,0 +1,146 @@
+# portfolio_app/middleware.py
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from . import metrics, profiling
+from .routers import replica_reads, routing_config
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRoutingMiddleware:
+    """Serve safe requests from read replicas, with read-your-writes stickiness.
+
+    A successful unsafe request (a buy, sell, update...) sets a short-lived
+    cookie that keeps the client on the primary for ``PIN_SECONDS``, so it sees
+    its own writes despite replication lag. Sending ``X-Read-Primary: true``
+    forces the primary for a single request.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def use_replica(self, request):
+        config = routing_config()
+        return (
+            request.method in SAFE_METHODS
+            and config.get('PIN_COOKIE', 'read_primary') not in request.COOKIES
+            and request.headers.get('X-Read-Primary', '').lower() not in ('1', 'true')
+        )
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            config = routing_config()
+            response.set_cookie(
+                config.get('PIN_COOKIE', 'read_primary'), '1',
+                max_age=config.get('PIN_SECONDS', 5), httponly=True, samesite='Lax'
+            )
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.use_replica(request)):
+            response = self.get_response(request)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        with replica_reads(self.use_replica(request)):
+            response = await self.get_response(request)
+        return self.pin(request, response)
+
+
+class MetricsMiddleware:
+    """Time each request and record its SQL and serializer cost per view.
+
+    Totals go into the /metrics histograms and, unless METRICS['SERVER_TIMING']
+    is off, into a ``Server-Timing`` header the browser devtools display.
+    Place it first so the latency covers the other middleware too.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def report(self, request, response, timings):
+        match = request.resolver_match
+        view = match.view_name if match is not None else 'unmatched'
+        metrics.observe_request(timings, view, request.method, response.status_code)
+        if metrics.metrics_config().get('SERVER_TIMING', True):
+            response['Server-Timing'] = metrics.server_timing(timings)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with metrics.record() as timings:
+            response = self.get_response(request)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        with metrics.record() as timings:
+            response = await self.get_response(request)
+        return self.report(request, response, timings)
+
+
+class ProfilingMiddleware:
+    """Capture a sampling profile of selected requests (portfolio_app.profiling).
+
+    A request is profiled when a staff user sends the PROFILING['HEADER']
+    header (``X-Profile: 1`` by default), or at random with probability
+    ``SAMPLE_RATE``. The stored profile's name is returned in
+    ``X-Profile-Id``. Must come after AuthenticationMiddleware.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def requested(self, request):
+        header = profiling.profiling_config().get('HEADER', 'X-Profile')
+        return request.headers.get(header, '').lower() in ('1', 'true')
+
+    def save(self, request, response, sampler):
+        sampler.stop()
+        match = request.resolver_match
+        name = profiling.save('request', match.view_name if match is not None else 'unmatched', sampler)
+        if name is not None:
+            response['X-Profile-Id'] = name
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not (self.requested(request) and request.user.is_staff) and not profiling.sampled('SAMPLE_RATE'):
+            return self.get_response(request)
+        sampler = profiling.Sampler().start()
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            sampler.stop()
+            raise
+        return self.save(request, response, sampler)
+
+    async def __acall__(self, request):
+        if not (self.requested(request) and (await request.auser()).is_staff) and not profiling.sampled('SAMPLE_RATE'):
+            return await self.get_response(request)
+        # Samples the event loop thread, which other requests share meanwhile
+        sampler = profiling.Sampler().start()
+        try:
+            response = await self.get_response(request)
+        except BaseException:
+            sampler.stop()
+            raise
+        return self.save(request, response, sampler)
@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def backfill_positions(apps, schema_editor):
+    StockLot = apps.get_model('portfolio_app', 'StockLot')
+    Position = apps.get_model('portfolio_app', 'Position')
+    aggregates = (
+        StockLot.objects.filter(remaining_quantity__gt=0)
+        .values('portfolio_id', 'stock_id')
+        .annotate(
+            shares=Sum('remaining_quantity'),
+            total_cost=Sum(F('purchase_price') * F('remaining_quantity')),
+        )
+        .order_by()
+    )
+    Position.objects.bulk_create([Position(**row) for row in aggregates])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0003_news'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Position',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shares', models.IntegerField(default=0)),
+                ('total_cost', models.DecimalField(decimal_places=2, default=0, max_digits=20)),
+                ('last_updated', models.DateTimeField(auto_now=True)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='positions', to='portfolio_app.portfolio')),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='portfolio_app.stock')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('portfolio', 'stock'), name='unique_position_per_stock')],
+            },
+        ),
+        migrations.RunPython(backfill_positions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0004_position'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PriceTick',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('price', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('stock', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ticks', to='portfolio_app.stock')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['stock', 'timestamp'], name='pricetick_stock_time_idx')],
+            },
+        ),
+    ]
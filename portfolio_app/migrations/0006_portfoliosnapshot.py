@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0005_pricetick'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PortfolioSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('timestamp', models.DateTimeField()),
+                ('cash_balance', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('stock_value', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('portfolio', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='portfolio_app.portfolio')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['portfolio', 'timestamp'], name='snapshot_portfolio_time_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:28
+
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_news(apps, schema_editor):
+    """Keep the oldest row of each (title, date) so the unique constraint can be added"""
+    News = apps.get_model('portfolio_app', 'News')
+    duplicates = (
+        News.objects.values('title', 'date')
+        .annotate(keep_id=Min('id'), rows=Count('id'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for row in duplicates:
+        News.objects.filter(title=row['title'], date=row['date']).exclude(id=row['keep_id']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0007_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='stocklot',
+            index=models.Index(condition=models.Q(('remaining_quantity__gt', 0)), fields=['portfolio', 'stock', 'purchase_date'], name='stocklot_open_fifo_idx'),
+        ),
+        migrations.RunPython(remove_duplicate_news, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='news',
+            constraint=models.UniqueConstraint(fields=('title', 'date'), name='unique_news_title_date'),
+        ),
+    ]
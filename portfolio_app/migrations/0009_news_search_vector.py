@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:32
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Titles outrank descriptions; the config must match NEWS_SEARCH_CONFIG in models.py
+CREATE_SEARCH_VECTOR = [
+    """
+    CREATE FUNCTION portfolio_app_news_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('french', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('french', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER portfolio_app_news_search_vector_update
+        BEFORE INSERT OR UPDATE OF title, description ON portfolio_app_news
+        FOR EACH ROW EXECUTE FUNCTION portfolio_app_news_search_vector()
+    """,
+    # Fire the trigger once for existing rows
+    "UPDATE portfolio_app_news SET title = title",
+    "CREATE INDEX news_search_vector_idx ON portfolio_app_news USING gin (search_vector)",
+]
+
+DROP_SEARCH_VECTOR = [
+    "DROP INDEX IF EXISTS news_search_vector_idx",
+    "DROP TRIGGER IF EXISTS portfolio_app_news_search_vector_update ON portfolio_app_news",
+    "DROP FUNCTION IF EXISTS portfolio_app_news_search_vector()",
+]
+
+
+def create_search_vector(apps, schema_editor):
+    """Trigger, backfill and GIN index exist on PostgreSQL only"""
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in CREATE_SEARCH_VECTOR:
+            schema_editor.execute(statement, params=None)
+
+
+def drop_search_vector(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        for statement in DROP_SEARCH_VECTOR:
+            schema_editor.execute(statement, params=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0008_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='news',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_vector, drop_search_vector),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 18:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('portfolio_app', '0009_news_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stock',
+            name='listed',
+            field=models.BooleanField(default=True),
+        ),
+    ]
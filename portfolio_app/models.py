@@ -1,5 +1,12 @@
-from django.db import models
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField
+from django.db import connections, models, router, transaction
+from django.db.models import (
+    Case, F, FloatField, Max, Min, OuterRef, Q, Subquery, Sum, Value, When, Window
+)
+from django.db.models.functions import Coalesce, FirstValue, Trunc
+from django.utils import timezone
 from decimal import Decimal
+from .quotes import quote_cache
 
 class Stock(models.Model):
     id = models.AutoField(primary_key=True)
@@ -7,10 +14,85 @@ class Stock(models.Model):
     name = models.CharField(max_length=255)
     price = models.DecimalField(max_digits=20, decimal_places=2)
     sector = models.CharField(max_length=100)
+    # Cleared by `manage.py sync_stocks --mark-delisted` when the feed drops the symbol
+    listed = models.BooleanField(default=True)
 
     def __str__(self):
         return self.symbol
 
+class PriceTickQuerySet(models.QuerySet):
+    def _bucket_windows(self, unit):
+        bucket = Trunc('timestamp', unit)
+        partition = {'partition_by': [F('stock_id'), bucket]}
+        return bucket, partition
+
+    def candles(self, unit):
+        """OHLC candles per ``unit`` bucket ('minute', 'hour', 'day', 'week'), computed in SQL"""
+        bucket, partition = self._bucket_windows(unit)
+        return self.annotate(
+            time=bucket,
+            open=Window(FirstValue('price'), order_by=[F('timestamp').asc(), F('id').asc()], **partition),
+            close=Window(FirstValue('price'), order_by=[F('timestamp').desc(), F('id').desc()], **partition),
+            high=Window(Max('price'), **partition),
+            low=Window(Min('price'), **partition),
+        ).values('time', 'open', 'high', 'low', 'close').distinct().order_by('time')
+
+    def compact(self, unit):
+        """Delete every tick that is not the open, high, low or close of its ``unit`` bucket.
+
+        Candles at ``unit`` resolution or coarser are unchanged by the rollup.
+        Returns the number of deleted ticks.
+        """
+        bucket, partition = self._bucket_windows(unit)
+        extremes = self.annotate(
+            open_id=Window(FirstValue('id'), order_by=[F('timestamp').asc(), F('id').asc()], **partition),
+            close_id=Window(FirstValue('id'), order_by=[F('timestamp').desc(), F('id').desc()], **partition),
+            high_id=Window(FirstValue('id'), order_by=[F('price').desc(), F('timestamp').asc()], **partition),
+            low_id=Window(FirstValue('id'), order_by=[F('price').asc(), F('timestamp').asc()], **partition),
+        )
+        deleted, _ = self.exclude(id__in=extremes.values('open_id')).exclude(
+            id__in=extremes.values('close_id')
+        ).exclude(
+            id__in=extremes.values('high_id')
+        ).exclude(
+            id__in=extremes.values('low_id')
+        ).delete()
+        return deleted
+
+class PriceTick(models.Model):
+    """A single observed price, appended by the price ingestion task"""
+    stock = models.ForeignKey('Stock', on_delete=models.CASCADE, related_name='ticks')
+    timestamp = models.DateTimeField()
+    price = models.DecimalField(max_digits=20, decimal_places=2)
+
+    objects = PriceTickQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.stock_id} @ {self.timestamp}: {self.price} DT"
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['stock', 'timestamp'], name='pricetick_stock_time_idx'),
+        ]
+
+class StockLotQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(remaining_quantity__gt=0)
+
+    def positions(self):
+        """Aggregate open lots into one row per (portfolio, stock) in a single query"""
+        return self.open().values(
+            'portfolio_id',
+            'stock_id',
+            symbol=F('stock__symbol'),
+            name=F('stock__name'),
+            current_price=F('stock__price'),
+        ).annotate(
+            shares=Sum('remaining_quantity'),
+            total_cost=Sum(F('purchase_price') * F('remaining_quantity')),
+            current_value=Sum(F('stock__price') * F('remaining_quantity')),
+        ).order_by('symbol')
+
 class StockLot(models.Model):
     portfolio = models.ForeignKey('Portfolio', on_delete=models.CASCADE, related_name='stock_lots')
     stock = models.ForeignKey('Stock', on_delete=models.CASCADE)
@@ -19,11 +101,49 @@ class StockLot(models.Model):
     quantity = models.IntegerField()
     remaining_quantity = models.IntegerField()
 
+    objects = StockLotQuerySet.as_manager()
+
     def __str__(self):
         return f"{self.stock.symbol} - {self.remaining_quantity}/{self.quantity} shares at {self.purchase_price} DT"
 
     class Meta:
         ordering = ['purchase_date']
+        indexes = [
+            # FIFO lookups only ever touch lots with shares left
+            models.Index(
+                fields=['portfolio', 'stock', 'purchase_date'],
+                condition=models.Q(remaining_quantity__gt=0),
+                name='stocklot_open_fifo_idx',
+            ),
+        ]
+
+class PositionQuerySet(models.QuerySet):
+    def open(self):
+        return self.filter(shares__gt=0)
+
+class Position(models.Model):
+    """Denormalized per-stock holding, kept in sync by buy_stock/sell_stock"""
+    portfolio = models.ForeignKey('Portfolio', on_delete=models.CASCADE, related_name='positions')
+    stock = models.ForeignKey('Stock', on_delete=models.CASCADE)
+    shares = models.IntegerField(default=0)
+    total_cost = models.DecimalField(max_digits=20, decimal_places=2, default=0)
+    last_updated = models.DateTimeField(auto_now=True)
+
+    objects = PositionQuerySet.as_manager()
+
+    def __str__(self):
+        return f"{self.stock.symbol} - {self.shares} shares in portfolio {self.portfolio_id}"
+
+    @property
+    def avg_cost(self):
+        if self.shares == 0:
+            return Decimal(0)
+        return self.total_cost / self.shares
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['portfolio', 'stock'], name='unique_position_per_stock'),
+        ]
 
 class Portfolio(models.Model):
     id = models.AutoField(primary_key=True)
@@ -34,19 +154,15 @@ class Portfolio(models.Model):
     def __str__(self):
         return f"Portfolio {self.id}"
 
-    def calculate_position(self, stock):
+    def calculate_position(self, stock, include_lots=True):
         """Calculate current position and returns for a specific stock"""
-        lots = StockLot.objects.filter(
-            portfolio=self,
-            stock=stock,
-            remaining_quantity__gt=0
-        ).order_by('purchase_date')
-        
-        total_shares = sum(lot.remaining_quantity for lot in lots)
-        total_cost = sum(lot.purchase_price * lot.remaining_quantity for lot in lots)
-        current_value = stock.price * total_shares
+        lots = StockLot.objects.filter(portfolio=self, stock=stock).open()
+        aggregate = lots.aggregate(
+            shares=Sum('remaining_quantity'),
+            total_cost=Sum(F('purchase_price') * F('remaining_quantity'))
+        )
         
-        if total_shares == 0:
+        if not aggregate['shares']:
             return {
                 'shares': 0,
                 'avg_cost': Decimal(0),
@@ -55,113 +171,416 @@ class Portfolio(models.Model):
                 'unrealized_gain': Decimal(0),
                 'return_percentage': Decimal(0)
             }
-            
-        avg_cost = total_cost / total_shares
-        unrealized_gain = current_value - total_cost
-        return_percentage = (unrealized_gain / total_cost * 100) if total_cost > 0 else Decimal(0)
         
+        price = quote_cache.price(stock.id)
+        if price is None:
+            price = stock.price
+        position = self._valuation(aggregate['shares'], aggregate['total_cost'], price * aggregate['shares'])
+        if include_lots:
+            position['lots'] = [
+                self._lot_detail(lot, price)
+                for lot in lots.order_by('purchase_date')
+            ]
+        return position
+
+    @staticmethod
+    def _valuation(shares, total_cost, current_value):
+        unrealized_gain = current_value - total_cost
         return {
-            'shares': total_shares,
-            'avg_cost': avg_cost,
+            'shares': shares,
+            'avg_cost': total_cost / shares,
             'total_cost': total_cost,
             'current_value': current_value,
             'unrealized_gain': unrealized_gain,
-            'return_percentage': return_percentage,
-            'lots': [
-                {
-                    'purchase_date': lot.purchase_date,
-                    'shares': lot.remaining_quantity,
-                    'price': lot.purchase_price,
-                    'cost': lot.purchase_price * lot.remaining_quantity,
-                    'current_value': stock.price * lot.remaining_quantity,
-                    'gain': (stock.price - lot.purchase_price) * lot.remaining_quantity,
-                    'return_percentage': ((stock.price - lot.purchase_price) / lot.purchase_price * 100)
-                }
-                for lot in lots
-            ]
+            'return_percentage': (unrealized_gain / total_cost * 100) if total_cost > 0 else Decimal(0)
         }
 
+    @staticmethod
+    def _lot_detail(lot, current_price):
+        return {
+            'purchase_date': lot.purchase_date,
+            'shares': lot.remaining_quantity,
+            'price': lot.purchase_price,
+            'cost': lot.purchase_price * lot.remaining_quantity,
+            'current_value': current_price * lot.remaining_quantity,
+            'gain': (current_price - lot.purchase_price) * lot.remaining_quantity,
+            'return_percentage': ((current_price - lot.purchase_price) / lot.purchase_price * 100)
+        }
+
+    def get_positions(self, include_lots=False):
+        """All current positions, read from the materialized Position table.
+
+        Stock details and prices come from the quote cache. Reuses prefetched
+        ``positions`` and ``stock_lots`` when the caller has loaded them.
+        """
+        prefetched = getattr(self, '_prefetched_objects_cache', {})
+        if 'positions' in prefetched:
+            positions = [position for position in self.positions.all() if position.shares > 0]
+        else:
+            positions = list(self.positions.open())
+        quotes = quote_cache.get_many([position.stock_id for position in positions])
+        
+        # Lot detail is only fetched on request, in a single query
+        lots = []
+        if include_lots:
+            lots = self.stock_lots.all() if 'stock_lots' in prefetched else self.stock_lots.open()
+        return self._position_rows(positions, quotes, lots, include_lots)
+
+    async def aget_positions(self, include_lots=False):
+        """get_positions for async views, using the async ORM and quote cache"""
+        positions = [position async for position in self.positions.open()]
+        quotes = await quote_cache.aget_many([position.stock_id for position in positions])
+        lots = [lot async for lot in self.stock_lots.open()] if include_lots else []
+        return self._position_rows(positions, quotes, lots, include_lots)
+
+    def _position_rows(self, positions, quotes, lots, include_lots):
+        lots_by_stock = {}
+        for lot in lots:
+            if lot.remaining_quantity > 0:
+                lots_by_stock.setdefault(lot.stock_id, []).append(lot)
+        
+        results = []
+        for position in sorted(positions, key=lambda position: quotes[position.stock_id]['symbol']):
+            quote = quotes[position.stock_id]
+            price = Decimal(quote['price'])
+            row = {
+                'symbol': quote['symbol'],
+                'name': quote['name'],
+                'current_price': price,
+                **self._valuation(position.shares, position.total_cost, price * position.shares)
+            }
+            if include_lots:
+                row['lots'] = [
+                    self._lot_detail(lot, price)
+                    for lot in lots_by_stock.get(position.stock_id, [])
+                ]
+            results.append(row)
+        return results
+
     def calculate_total_value(self):
         """Calculate total portfolio value (cash + stocks)"""
+        shares_by_stock = dict(
+            self.stock_lots.open().values('stock_id').annotate(
+                shares=Sum('remaining_quantity')
+            ).values_list('stock_id', 'shares').order_by()
+        )
+        prices = quote_cache.prices(shares_by_stock.keys())
         stock_value = sum(
-            lot.stock.price * lot.remaining_quantity 
-            for lot in self.stock_lots.filter(remaining_quantity__gt=0)
+            (prices[stock_id] * shares for stock_id, shares in shares_by_stock.items()),
+            Decimal(0)
         )
         self.totalValue = self.cash_balance + stock_value
         self.save()
         return self.totalValue
 
-    def buy_stock(self, stock, quantity, price):
-        """Buy stocks if user has enough cash"""
-        total_cost = price * quantity
+    @staticmethod
+    def _stock_value_expression():
+        """Market value of a portfolio's open lots, as a correlated subquery"""
+        stock_value = StockLot.objects.open().filter(
+            portfolio=OuterRef('pk')
+        ).values('portfolio').annotate(
+            total=Sum(F('stock__price') * F('remaining_quantity'))
+        ).values('total')
+        return Coalesce(
+            Subquery(stock_value),
+            Value(Decimal(0)),
+            output_field=models.DecimalField(max_digits=20, decimal_places=2)
+        )
+
+    @classmethod
+    def revalue_all(cls, queryset=None):
+        """Recompute totalValue for every portfolio in one set-based UPDATE.
+
+        Returns the number of portfolios whose value changed.
+        """
+        new_value = F('cash_balance') + cls._stock_value_expression()
         
-        if total_cost > self.cash_balance:
-            raise ValueError("Insufficient funds for this purchase")
-            
-        # Create new stock lot
-        lot = StockLot.objects.create(
-            portfolio=self,
-            stock=stock,
-            purchase_price=price,
-            quantity=quantity,
-            remaining_quantity=quantity
+        queryset = cls.objects.all() if queryset is None else queryset
+        return queryset.exclude(totalValue=new_value).update(
+            totalValue=new_value,
+            last_updated=timezone.now()
         )
+
+    def _apply_cash_delta(self, delta, revalue=True):
+        """Move cash (and refresh totalValue unless told not to) in a single UPDATE"""
+        portfolios = Portfolio.objects.filter(pk=self.pk)
+        if delta < 0:
+            # Guard against concurrent purchases spending the same cash
+            portfolios = portfolios.filter(cash_balance__gte=-delta)
         
-        # Update cash balance
-        self.cash_balance -= total_cost
-        self.save()
+        updates = {
+            'cash_balance': F('cash_balance') + delta,
+            'last_updated': timezone.now()
+        }
+        if revalue:
+            updates['totalValue'] = F('cash_balance') + delta + self._stock_value_expression()
+        if not portfolios.update(**updates):
+            raise ValueError("Insufficient funds for this purchase")
+        
+        if revalue:
+            self.refresh_from_db(fields=['cash_balance', 'totalValue', 'last_updated'])
+        else:
+            self.cash_balance += delta
+
+    def _lock(self):
+        """Lock this portfolio's row and reload its cash.
+
+        Every trade takes this lock before touching lots or positions, so
+        concurrent trades on one portfolio always lock rows in the same order.
+        """
+        self.cash_balance = Portfolio.objects.select_for_update().values_list(
+            'cash_balance', flat=True
+        ).get(pk=self.pk)
+
+    def buy_stock(self, stock, quantity, price, revalue=True):
+        """Buy stocks if user has enough cash"""
+        total_cost = price * quantity
         
-        # Update total value
-        self.calculate_total_value()
+        with transaction.atomic():
+            self._lock()
+            if total_cost > self.cash_balance:
+                raise ValueError("Insufficient funds for this purchase")
+            
+            # Create new stock lot
+            lot = StockLot.objects.create(
+                portfolio=self,
+                stock=stock,
+                purchase_price=price,
+                quantity=quantity,
+                remaining_quantity=quantity
+            )
+            self._update_position(stock, quantity, total_cost)
+            
+            # Update cash balance and total value
+            self._apply_cash_delta(-total_cost, revalue=revalue)
         return lot
 
-    def sell_stock(self, stock, quantity, price):
+    def sell_stock(self, stock, quantity, price, revalue=True):
         """Sell stocks using FIFO method"""
-        lots = StockLot.objects.filter(
-            portfolio=self,
-            stock=stock,
-            remaining_quantity__gt=0
-        ).order_by('purchase_date')
-        
-        total_available = sum(lot.remaining_quantity for lot in lots)
-        if quantity > total_available:
-            raise ValueError(f"Not enough shares. You only have {total_available} shares available.")
-        
-        remaining_to_sell = quantity
-        realized_gain = Decimal(0)
-        transactions = []
-        
-        for lot in lots:
-            if remaining_to_sell <= 0:
-                break
-                
-            shares_from_lot = min(lot.remaining_quantity, remaining_to_sell)
-            lot.remaining_quantity -= shares_from_lot
-            lot.save()
+        with transaction.atomic():
+            self._lock()
+            # Lock the open lots so concurrent sells cannot consume the same shares
+            lots = list(StockLot.objects.select_for_update().filter(
+                portfolio=self,
+                stock=stock,
+                remaining_quantity__gt=0
+            ).order_by('purchase_date', 'id'))
+            
+            total_available = sum(lot.remaining_quantity for lot in lots)
+            if quantity > total_available:
+                raise ValueError(f"Not enough shares. You only have {total_available} shares available.")
             
-            # Calculate realized gain
-            realized_gain += (price - lot.purchase_price) * shares_from_lot
-            remaining_to_sell -= shares_from_lot
+            remaining_to_sell = quantity
+            realized_gain = Decimal(0)
+            cost_sold = Decimal(0)
+            consumed = []
+            transactions = []
+            user = self.user
             
-            # Record transaction
-            transactions.append(
-                Transaction.objects.create(
-                    user=self.user,
-                    type='SELL',
-                    stock=stock,
-                    quantity=shares_from_lot,
-                    price=price,
-                    lot=lot
+            # Apply the FIFO depletion in memory, then persist in bulk
+            for lot in lots:
+                if remaining_to_sell <= 0:
+                    break
+                    
+                shares_from_lot = min(lot.remaining_quantity, remaining_to_sell)
+                lot.remaining_quantity -= shares_from_lot
+                consumed.append(lot)
+                
+                # Calculate realized gain
+                realized_gain += (price - lot.purchase_price) * shares_from_lot
+                cost_sold += lot.purchase_price * shares_from_lot
+                remaining_to_sell -= shares_from_lot
+                
+                transactions.append(
+                    Transaction(
+                        user=user,
+                        type='SELL',
+                        stock=stock,
+                        quantity=shares_from_lot,
+                        price=price,
+                        lot=lot
+                    )
                 )
-            )
             
-            # Add to cash balance
-            self.cash_balance += price * shares_from_lot
+            StockLot.objects.bulk_update(consumed, ['remaining_quantity'])
+            transactions = Transaction.objects.bulk_create(transactions)
+            self._update_position(stock, -quantity, -cost_sold)
             
-        self.save()
-        self.calculate_total_value()
+            # Add proceeds to cash balance and update total value
+            self._apply_cash_delta(price * quantity, revalue=revalue)
         return realized_gain, transactions
 
+    def execute_orders(self, orders):
+        """Fill a batch of (side, stock, quantity, price) orders in a fixed number of queries.
+
+        Orders are checked in sequence against the cash and shares left by
+        the ones before them; an order that cannot be filled is skipped and
+        leaves the rest untouched. Returns one dict per order, holding either
+        ``error`` or the new ``lot`` / sell ``transactions`` and ``realized_gain``.
+        """
+        with transaction.atomic():
+            self._lock()
+            stock_ids = {stock.id for _, stock, _, _ in orders}
+            lots_by_stock = {}
+            for lot in StockLot.objects.select_for_update().filter(
+                portfolio=self,
+                stock_id__in={stock.id for side, stock, _, _ in orders if side == 'sell'},
+                remaining_quantity__gt=0
+            ).order_by('purchase_date', 'id'):
+                lots_by_stock.setdefault(lot.stock_id, []).append(lot)
+            positions = {
+                position.stock_id: position
+                for position in Position.objects.select_for_update().filter(portfolio=self, stock_id__in=stock_ids)
+            }
+            
+            cash = self.cash_balance
+            user = self.user
+            new_lots = []
+            consumed = {}
+            transactions = []
+            touched = set()
+            results = []
+            
+            # Simulate the whole batch in memory, then persist each kind of row in bulk
+            for side, stock, quantity, price in orders:
+                lots = lots_by_stock.setdefault(stock.id, [])
+                if side == 'buy':
+                    total_cost = price * quantity
+                    if total_cost > cash:
+                        results.append({'error': 'Insufficient funds for this purchase'})
+                        continue
+                    lot = StockLot(
+                        portfolio=self,
+                        stock=stock,
+                        purchase_price=price,
+                        quantity=quantity,
+                        remaining_quantity=quantity
+                    )
+                    new_lots.append(lot)
+                    lots.append(lot)
+                    transactions.append(Transaction(
+                        user=user, type='BUY', stock=stock, quantity=quantity, price=price, lot=lot
+                    ))
+                    cash -= total_cost
+                    shares_delta, cost_delta = quantity, total_cost
+                    results.append({'lot': lot, 'transactions': transactions[-1:]})
+                else:
+                    total_available = sum(lot.remaining_quantity for lot in lots)
+                    if quantity > total_available:
+                        results.append({
+                            'error': f"Not enough shares. You only have {total_available} shares available."
+                        })
+                        continue
+                    remaining_to_sell = quantity
+                    realized_gain = Decimal(0)
+                    cost_sold = Decimal(0)
+                    sold = []
+                    for lot in lots:
+                        if remaining_to_sell <= 0:
+                            break
+                        if lot.remaining_quantity <= 0:
+                            continue
+                        shares_from_lot = min(lot.remaining_quantity, remaining_to_sell)
+                        lot.remaining_quantity -= shares_from_lot
+                        if lot.pk is not None:
+                            consumed[lot.pk] = lot
+                        realized_gain += (price - lot.purchase_price) * shares_from_lot
+                        cost_sold += lot.purchase_price * shares_from_lot
+                        remaining_to_sell -= shares_from_lot
+                        sold.append(Transaction(
+                            user=user, type='SELL', stock=stock, quantity=shares_from_lot, price=price, lot=lot
+                        ))
+                    transactions.extend(sold)
+                    cash += price * quantity
+                    shares_delta, cost_delta = -quantity, -cost_sold
+                    results.append({'realized_gain': realized_gain, 'transactions': sold})
+                
+                position = positions.get(stock.id)
+                if position is None:
+                    position = positions[stock.id] = Position(portfolio=self, stock=stock)
+                position.shares += shares_delta
+                position.total_cost += cost_delta
+                touched.add(stock.id)
+            
+            # New lots first: sells within the batch may point their transactions at them
+            StockLot.objects.bulk_create(new_lots)
+            StockLot.objects.bulk_update(consumed.values(), ['remaining_quantity'])
+            Transaction.objects.bulk_create(transactions)
+            
+            changed = [positions[stock_id] for stock_id in touched]
+            closed = [position.pk for position in changed if position.shares <= 0 and position.pk is not None]
+            if closed:
+                Position.objects.filter(pk__in=closed).delete()
+            now = timezone.now()
+            for position in changed:
+                position.last_updated = now
+            Position.objects.bulk_create([
+                position for position in changed if position.shares > 0 and position.pk is None
+            ])
+            Position.objects.bulk_update([
+                position for position in changed if position.shares > 0 and position.pk is not None
+            ], ['shares', 'total_cost', 'last_updated'])
+            
+            self._apply_cash_delta(cash - self.cash_balance)
+        return results
+
+    def _update_position(self, stock, shares_delta, cost_delta):
+        """Apply a buy/sell delta to the materialized Position row"""
+        position, _ = Position.objects.select_for_update().get_or_create(
+            portfolio=self,
+            stock=stock
+        )
+        position.shares += shares_delta
+        position.total_cost += cost_delta
+        
+        # Closed positions are dropped so the table holds one row per holding
+        if position.shares <= 0:
+            position.delete()
+            return None
+        position.save()
+        return position
+
+class PortfolioSnapshot(models.Model):
+    """Point-in-time cash and stock value of a portfolio, for equity curves"""
+    portfolio = models.ForeignKey(Portfolio, on_delete=models.CASCADE, related_name='snapshots')
+    timestamp = models.DateTimeField()
+    cash_balance = models.DecimalField(max_digits=20, decimal_places=2)
+    stock_value = models.DecimalField(max_digits=20, decimal_places=2)
+
+    def __str__(self):
+        return f"Portfolio {self.portfolio_id} @ {self.timestamp}"
+
+    @classmethod
+    def capture_all(cls):
+        """Snapshot every portfolio with one INSERT ... SELECT. Returns the row count."""
+        using = router.db_for_write(cls)
+        connection = connections[using]
+        # Every column is an annotation, defined in insert order, so the SELECT lines up
+        rows = Portfolio.objects.using(using).annotate(
+            snapshot_portfolio=F('id'),
+            snapshot_timestamp=Value(timezone.now(), output_field=models.DateTimeField()),
+            snapshot_cash=F('cash_balance'),
+            snapshot_stock_value=Portfolio._stock_value_expression(),
+        ).values_list(
+            'snapshot_portfolio', 'snapshot_timestamp', 'snapshot_cash', 'snapshot_stock_value'
+        ).order_by()
+        select, params = rows.query.get_compiler(using=using).as_sql()
+        columns = ', '.join(
+            connection.ops.quote_name(cls._meta.get_field(name).column)
+            for name in ('portfolio', 'timestamp', 'cash_balance', 'stock_value')
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {connection.ops.quote_name(cls._meta.db_table)} ({columns}) {select}',
+                params
+            )
+            return cursor.rowcount
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['portfolio', 'timestamp'], name='snapshot_portfolio_time_idx'),
+        ]
+
 class User(models.Model):
     id = models.AutoField(primary_key=True)
     username = models.CharField(max_length=255)
@@ -206,7 +625,41 @@ class Transaction(models.Model):
 
     class Meta:
         ordering = ['-date']
+        indexes = [
+            # Keyset pagination, globally and per user
+            models.Index(fields=['-date', '-id'], name='transaction_date_id_idx'),
+            models.Index(fields=['user', '-date', '-id'], name='transaction_user_date_id_idx'),
+        ]
+
 
+# Text search configuration used by the search_vector trigger and by queries
+NEWS_SEARCH_CONFIG = 'french'
+
+class NewsQuerySet(models.QuerySet):
+    def search(self, text):
+        """Articles matching ``text``, annotated with a ``rank`` (higher is better).
+
+        On PostgreSQL this uses the GIN-indexed ``search_vector`` column; other
+        backends fall back to case-insensitive matching of every word.
+        """
+        if connections[self.db].vendor == 'postgresql':
+            query = SearchQuery(text, config=NEWS_SEARCH_CONFIG, search_type='websearch')
+            return self.filter(search_vector=query).annotate(
+                rank=SearchRank(F('search_vector'), query)
+            )
+
+        terms = text.split()
+        queryset = self
+        rank = Value(0.0)
+        for term in terms:
+            queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+            # Words found in the title count double
+            rank = rank + Case(
+                When(title__icontains=term, then=Value(1.0)),
+                default=Value(0.5),
+                output_field=FloatField(),
+            )
+        return queryset.annotate(rank=rank)
 
 class News(models.Model):
     id = models.AutoField(primary_key=True)
@@ -214,10 +667,38 @@ class News(models.Model):
     date = models.DateField()  # Date of the news event
     description = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)  # Date when the news was added to the system
+    # Weighted tsvector of title and description, filled by a database trigger on
+    # PostgreSQL so bulk imports are covered too; unused on other backends
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = NewsQuerySet.as_manager()
+
+    # Shared-cache marker of the last insert, edit or delete, for conditional GETs
+    CHANGED_KEY = 'news:changed'
+
+    @classmethod
+    def mark_changed(cls):
+        quote_cache.backend.set(cls.CHANGED_KEY, timezone.now(), None)
+
+    @classmethod
+    def last_changed(cls):
+        """When any news last changed; a lost marker counts as a change now"""
+        backend = quote_cache.backend
+        changed = backend.get(cls.CHANGED_KEY)
+        if changed is None:
+            backend.add(cls.CHANGED_KEY, timezone.now(), None)
+            changed = backend.get(cls.CHANGED_KEY)
+        return changed
 
     class Meta:
         ordering = ['-date']
         verbose_name_plural = "News"  # Correct plural form in admin
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='news_date_id_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['title', 'date'], name='unique_news_title_date'),
+        ]
 
     def __str__(self):
         return self.title
\ No newline at end of file
@@ -2,7 +2,6 @@
 import os
 import sys
 import json
-from datetime import datetime
 
 # Add the project root directory to the Python path
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -14,13 +13,10 @@ import django
 django.setup()
 
 from portfolio_app.models import News
+from portfolio_app.news_stream import parse_french_date
 
-def parse_french_date(date_str):
-    """Convert French date format (DD/MM/YYYY) to Python datetime"""
-    try:
-        return datetime.strptime(date_str, '%d/%m/%Y').date()
-    except ValueError:
-        return None
+# For large dumps prefer `python manage.py import_news <path>`, which streams
+# the file and inserts in batches.
 
 def process_news_data(json_data):
     """Process and filter news data"""
@@ -0,0 +1,158 @@
+# portfolio_app/news_stream.py
+import json
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+
+# Only news from this year onwards is imported
+CUTOFF_YEAR = 2023
+
+REQUIRED_FIELDS = ('title', 'date', 'description')
+
+TITLE_MAX_LENGTH = 255
+
+_CHUNK_SIZE = 64 * 1024
+
+
+def parse_french_date(date_str):
+    """Convert French date format (DD/MM/YYYY) to Python datetime"""
+    try:
+        return datetime.strptime(date_str, '%d/%m/%Y').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def iter_json_items(file):
+    """Yield items from a JSON Lines file or a JSON array without loading it whole"""
+    first = ''
+    while not first:
+        chunk = file.read(_CHUNK_SIZE)
+        if not chunk:
+            return
+        first = chunk.lstrip()
+    if first.startswith('['):
+        yield from _iter_json_array(file, first[1:])
+    else:
+        yield from _iter_json_lines(file, first)
+
+
+def _iter_json_lines(file, buffer):
+    # Finish the partially read first chunk, then let the file iterate by line
+    head, _, rest = buffer.rpartition('\n')
+    pending = rest
+    for line in head.splitlines():
+        if line.strip():
+            yield json.loads(line)
+    for line in file:
+        if pending:
+            line, pending = pending + line, ''
+        if line.strip():
+            yield json.loads(line)
+    if pending.strip():
+        yield json.loads(pending)
+
+
+def _iter_json_array(file, buffer):
+    decoder = json.JSONDecoder()
+    position = 0
+    eof = False
+    while True:
+        # Skip separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            if position >= len(buffer):
+                raise json.JSONDecodeError('Need more data', buffer, position)
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            chunk = file.read(_CHUNK_SIZE)
+            eof = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item
+
+
+def validate_news(items, stats):
+    """Yield model-ready dicts for valid items, counting rejects in ``stats``"""
+    for item in items:
+        stats['read'] += 1
+        if not isinstance(item, dict) or not all(item.get(key) for key in REQUIRED_FIELDS):
+            stats['missing_fields'] += 1
+            continue
+
+        if not isinstance(item['title'], str) or not isinstance(item['description'], str):
+            stats['invalid_type'] += 1
+            continue
+
+        date = parse_french_date(item['date'])
+        if not date:
+            stats['invalid_date'] += 1
+            continue
+
+        if date.year < CUTOFF_YEAR:
+            stats['before_cutoff'] += 1
+            continue
+
+        if len(item['title']) > TITLE_MAX_LENGTH:
+            stats['title_too_long'] += 1
+            continue
+
+        stats['valid'] += 1
+        yield {
+            'title': item['title'],
+            'date': date,
+            'description': item['description']
+        }
+
+
+def chunked(iterable, size):
+    """Yield lists of at most ``size`` items"""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_valid_news(path, chunk_size, stats):
+    """Parse and validate one dump, yielding lists of at most ``chunk_size``
+    (title, date, description) rows as they are read.
+
+    Pure Python with no Django access, so it can run in a worker process.
+    """
+    with open(path, 'r', encoding='utf-8-sig') as file:
+        rows = (
+            (item['title'], item['date'], item['description'])
+            for item in validate_news(iter_json_items(file), stats)
+        )
+        yield from chunked(rows, chunk_size)
+    stats['files'] += 1
+
+
+# Set in each parser process by init_worker
+_results = None
+
+
+def init_worker(results):
+    global _results
+    _results = results
+
+
+def send_valid_news(path, chunk_size):
+    """Worker: push one dump's rows to the writer chunk by chunk.
+
+    Puts (path, None, rows) per chunk, then always (path, stats, None) last,
+    so the writer knows the file is finished even when parsing fails.
+    """
+    stats = Counter()
+    try:
+        for rows in iter_valid_news(path, chunk_size, stats):
+            _results.put((path, None, rows))
+    finally:
+        _results.put((path, stats, None))
@@ -0,0 +1,163 @@
+# portfolio_app/pagination.py
+import base64
+import json
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import FloatField, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on a composite key such as (date, id).
+
+    Each page is fetched with a ``WHERE (date, id) < (last date, last id)``
+    style filter on an indexed ordering, so page 500 costs the same as page 1
+    and no COUNT query is issued. ``ordering`` must end in a unique field.
+    """
+
+    ordering = ('-date', '-id')
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        config = getattr(settings, 'API_PAGINATION', {})
+        page_size = config.get('PAGE_SIZE', 50)
+        max_page_size = config.get('MAX_PAGE_SIZE', 200)
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+            if requested > 0:
+                page_size = requested
+        except (KeyError, ValueError):
+            pass
+        return min(page_size, max_page_size)
+
+    def _fields(self):
+        return [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def _encode_cursor(self, obj, reverse):
+        position = []
+        for name, _ in self._fields():
+            value = getattr(obj, name)
+            if isinstance(value, (date, datetime)):
+                value = value.isoformat()
+            position.append(value)
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def _decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            position = [
+                self._cursor_field(model, name).to_python(value)
+                for (name, _), value in zip(self._fields(), position)
+            ]
+            if None in position:
+                raise ValueError
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound('Invalid cursor')
+        return position, reverse
+
+    @staticmethod
+    def _cursor_field(model, name):
+        try:
+            return model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # Annotations such as the search rank
+            return FloatField()
+
+    def _after(self, position, reverse):
+        """Q matching rows strictly after ``position`` in the (possibly reversed) ordering"""
+        condition = Q()
+        equal = Q()
+        for (name, descending), value in zip(self._fields(), position):
+            lookup = 'lt' if descending != reverse else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        return condition
+
+    def _page_queryset(self, queryset, request):
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        self.page_size = self.get_page_size(request)
+        position, reverse = self._decode_cursor(request, queryset.model)
+        self.has_cursor = position is not None
+        self.reverse = reverse
+
+        ordering = self.ordering
+        if reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self._after(position, reverse))
+
+        # Fetch one extra row to learn whether another page follows
+        return queryset[:self.page_size + 1]
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self._build_page(list(self._page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset for async views, fetching the page with the async ORM"""
+        return self._build_page([obj async for obj in self._page_queryset(queryset, request)])
+
+    def _build_page(self, results):
+        reverse = self.reverse
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.next_url = None
+        self.previous_url = None
+        if results:
+            if has_more or reverse:
+                self.next_url = self._encode_cursor(results[-1], reverse=False)
+            if (has_more and reverse) or (self.has_cursor and not reverse):
+                self.previous_url = self._encode_cursor(results[0], reverse=True)
+        return results
+
+    def get_paginated_data(self, data):
+        return {
+            'next': self.next_url,
+            'previous': self.previous_url,
+            'results': data,
+        }
+
+    def get_paginated_response(self, data):
+        return Response(self.get_paginated_data(data))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class DateKeysetPagination(KeysetPagination):
+    """Newest first, keyed on (date, id) for transactions and news"""
+    ordering = ('-date', '-id')
+
+
+class IdKeysetPagination(KeysetPagination):
+    """Keyed on id alone, for models without a date column"""
+    ordering = ('id',)
+
+
+class RankKeysetPagination(KeysetPagination):
+    """Best match first for search results annotated with ``rank``"""
+    ordering = ('-rank', '-date', '-id')
@@ -0,0 +1,62 @@
+# portfolio_app/performance.py
+from datetime import timedelta
+
+import numpy as np
+
+# Trailing windows reported by period_returns, relative to the latest snapshot
+PERIODS = {
+    '1d': timedelta(days=1),
+    '1w': timedelta(weeks=1),
+    '1m': timedelta(days=30),
+    '3m': timedelta(days=91),
+    '1y': timedelta(days=365),
+}
+
+
+def equity_curve(snapshots):
+    """Split (timestamp, cash, stock value) rows into a timestamp list and value array"""
+    timestamps = [row[0] for row in snapshots]
+    values = np.array([row[1] + row[2] for row in snapshots], dtype=float)
+    return timestamps, values
+
+
+def period_returns(timestamps, values):
+    """Percentage return over each trailing period, None where history is too short"""
+    if len(values) == 0:
+        return {name: None for name in PERIODS}
+
+    seconds = np.array([ts.timestamp() for ts in timestamps])
+    latest = seconds[-1]
+    targets = np.array([latest - period.total_seconds() for period in PERIODS.values()])
+    # Index of the last snapshot taken at or before each period start
+    indexes = np.searchsorted(seconds, targets, side='right') - 1
+
+    results = {}
+    for name, index in zip(PERIODS, indexes):
+        if index < 0 or values[index] == 0:
+            results[name] = None
+        else:
+            results[name] = round(float((values[-1] / values[index] - 1) * 100), 4)
+    return results
+
+
+def summarize(timestamps, values):
+    """Total return, volatility and drawdown of an equity curve"""
+    if len(values) < 2:
+        return {
+            'total_return': None,
+            'volatility': None,
+            'max_drawdown': None,
+        }
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        returns = np.diff(values) / values[:-1]
+        drawdowns = values / np.maximum.accumulate(values) - 1
+    returns = returns[np.isfinite(returns)]
+    drawdowns = drawdowns[np.isfinite(drawdowns)]
+
+    return {
+        'total_return': round(float((values[-1] / values[0] - 1) * 100), 4) if values[0] else None,
+        'volatility': round(float(returns.std() * 100), 4) if len(returns) else None,
+        'max_drawdown': round(float(drawdowns.min() * 100), 4) if len(drawdowns) else None,
+    }
@@ -0,0 +1,158 @@
+# portfolio_app/profiling.py
+"""Opt-in statistical profiles of live requests and Celery tasks.
+
+While a selected request or task runs, a helper thread samples its stack
+every ``INTERVAL`` seconds. The samples are written to ``DIRECTORY`` in the
+collapsed-stack format ("frame;frame;frame count" per line) that
+flamegraph.pl and speedscope read directly. The oldest profiles are deleted
+once the directory grows past ``MAX_BYTES``.
+
+The sampler needs the GIL, so CPU-bound code is sampled at most every
+sys.getswitchinterval() (5ms by default) whatever ``INTERVAL`` says.
+"""
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+PROFILE_NAME = re.compile(
+    r'^(?P<created>\d{8}T\d{6})-(?P<kind>request|task)-(?P<label>[\w.]+)-(?P<duration_ms>\d+)ms-[0-9a-f]{8}\.folded$'
+)
+
+
+def profiling_config():
+    return getattr(settings, 'PROFILING', {})
+
+
+def profile_directory():
+    return Path(profiling_config().get('DIRECTORY', Path(settings.BASE_DIR) / 'profiles'))
+
+
+def sampled(rate_setting):
+    rate = profiling_config().get(rate_setting, 0.0)
+    return rate > 0 and random.random() < rate
+
+
+@lru_cache(maxsize=4096)
+def _short_path(filename):
+    # Trim install prefixes so frames read "django/db/models/query.py"
+    for prefix in sorted(sys.path, key=len, reverse=True):
+        if prefix and filename.startswith(prefix + os.sep):
+            return filename[len(prefix) + 1:]
+    return filename
+
+
+class Sampler:
+    """Counts the stacks one thread is seen in, polled from a helper thread"""
+
+    def __init__(self, thread_id=None, interval=None):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval or profiling_config().get('INTERVAL', 0.005)
+        self.samples = Counter()
+        self.started = None
+        self.duration = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='profiling-sampler', daemon=True)
+
+    def start(self):
+        self.started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.samples
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if self._stopped.is_set():
+                # The target is already in stop()
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+
+def save(kind, label, sampler):
+    """Write a sampler's stacks to the profile directory, returning the file name"""
+    if not sampler.samples:
+        return None
+    directory = profile_directory()
+    directory.mkdir(parents=True, exist_ok=True)
+    name = '{created}-{kind}-{label}-{duration_ms}ms-{id}.folded'.format(
+        created=timezone.now().strftime('%Y%m%dT%H%M%S'),
+        kind=kind,
+        label=re.sub(r'[^\w.]+', '_', label) or 'unknown',
+        duration_ms=round(sampler.duration * 1000),
+        id=uuid.uuid4().hex[:8],
+    )
+    lines = [f'{stack} {count}\n' for stack, count in sampler.samples.most_common()]
+    (directory / name).write_text(''.join(lines), encoding='utf-8')
+    enforce_limit()
+    return name
+
+
+def _profile_files():
+    directory = profile_directory()
+    if not directory.is_dir():
+        return []
+    files = []
+    for path in directory.iterdir():
+        if PROFILE_NAME.match(path.name):
+            try:
+                files.append((path, path.stat()))
+            except FileNotFoundError:
+                # Removed by another process enforcing the limit
+                continue
+    return sorted(files, key=lambda item: item[1].st_mtime_ns, reverse=True)
+
+
+def enforce_limit():
+    """Delete the oldest profiles beyond MAX_BYTES"""
+    budget = profiling_config().get('MAX_BYTES', 50 * 1024 * 1024)
+    used = 0
+    for path, stat in _profile_files():
+        used += stat.st_size
+        if used > budget:
+            path.unlink(missing_ok=True)
+
+
+def list_profiles(limit=100):
+    """Newest first, with what each file name records"""
+    profiles = []
+    for path, stat in _profile_files()[:limit]:
+        match = PROFILE_NAME.match(path.name)
+        profiles.append({
+            'name': path.name,
+            'kind': match['kind'],
+            'label': match['label'],
+            'duration_ms': int(match['duration_ms']),
+            'size': stat.st_size,
+            'created': datetime.strptime(match['created'], '%Y%m%dT%H%M%S').replace(tzinfo=dt_timezone.utc),
+        })
+    return profiles
+
+
+def profile_path(name):
+    """Path of a stored profile, or None for unknown or malformed names"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_directory() / name
+    return path if path.is_file() else None
@@ -0,0 +1,147 @@
+# portfolio_app/pubsub.py
+import asyncio
+import json
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+# Channel carrying the price deltas published by update_stock_prices_task
+PRICE_CHANNEL = 'prices'
+
+
+class InMemoryBroker:
+    """Process-local pub/sub, for tests and single-process development servers.
+
+    Each subscriber gets a queue on its own event loop; publish() may be called
+    from any thread.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}
+
+    def publish(self, channel, message):
+        self._deliver(channel, message)
+
+    def _deliver(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+
+    def _subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    async def subscribe(self, channel, ready=None):
+        """Yield messages published on ``channel`` until the caller stops iterating.
+
+        ``ready``, an asyncio.Event, is set once every message published from
+        then on is sure to be delivered.
+        """
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue())
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            await self._subscribed(channel)
+            if ready is not None:
+                ready.set()
+            while True:
+                yield await subscriber[1].get()
+        finally:
+            with self._lock:
+                self._subscribers[channel].discard(subscriber)
+
+    async def _subscribed(self, channel):
+        """Wait until messages on ``channel`` reach local subscribers"""
+
+
+class RedisBroker(InMemoryBroker):
+    """Redis pub/sub shared by Celery workers and every ASGI process.
+
+    Each process holds one Redis subscription per channel and fans messages
+    out to its local subscribers, so a tick costs one Redis message per
+    process rather than one per connected client.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0'):
+        super().__init__()
+        self.url = url
+        self._client = None
+        self._readers = {}
+        # Set once Redis has confirmed the reader's SUBSCRIBE
+        self._confirmed = {}
+
+    def publish(self, channel, message):
+        import redis
+
+        if self._client is None:
+            self._client = redis.Redis.from_url(self.url)
+        self._client.publish(channel, json.dumps(message))
+
+    async def subscribe(self, channel, ready=None):
+        key = (asyncio.get_running_loop(), channel)
+        if key not in self._readers or self._readers[key].done():
+            self._confirmed[key] = asyncio.Event()
+            self._readers[key] = asyncio.create_task(self._read(channel, self._confirmed[key]))
+        try:
+            async for message in super().subscribe(channel, ready):
+                yield message
+        finally:
+            # Drop the Redis subscription with the last local subscriber
+            if not self._subscriber_count(channel) and key in self._readers:
+                self._readers.pop(key).cancel()
+                self._confirmed.pop(key, None)
+
+    async def _subscribed(self, channel):
+        # The reader connects and subscribes over several awaits; messages
+        # published before Redis confirms the SUBSCRIBE are never delivered
+        key = (asyncio.get_running_loop(), channel)
+        reader, confirmed = self._readers[key], self._confirmed[key]
+        waiter = asyncio.ensure_future(confirmed.wait())
+        try:
+            await asyncio.wait({reader, waiter}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        if not confirmed.is_set():
+            # Surface the connection error
+            reader.result()
+
+    async def _read(self, channel, confirmed):
+        import redis.asyncio
+
+        client = redis.asyncio.Redis.from_url(self.url)
+        pubsub = client.pubsub()
+        await pubsub.subscribe(channel)
+        try:
+            async for message in pubsub.listen():
+                if message['type'] == 'subscribe':
+                    confirmed.set()
+                elif message['type'] == 'message':
+                    self._deliver(channel, json.loads(message['data']))
+        finally:
+            await pubsub.aclose()
+            await client.aclose()
+
+
+_broker = None
+
+
+def get_broker():
+    """The process-wide broker configured by settings.PRICE_STREAM"""
+    global _broker
+    if _broker is None:
+        config = getattr(settings, 'PRICE_STREAM', {})
+        backend = import_string(config.get('BACKEND', 'portfolio_app.pubsub.InMemoryBroker'))
+        _broker = backend(**config.get('OPTIONS', {}))
+    return _broker
+
+
+@receiver(setting_changed)
+def reset_broker(setting, **kwargs):
+    global _broker
+    if setting == 'PRICE_STREAM':
+        _broker = None
@@ -0,0 +1,246 @@
+# portfolio_app/quotes.py
+import threading
+import time
+import uuid
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+
+class QuoteCache:
+    """Read-through cache of the stock universe, versioned by the price task.
+
+    The whole universe is stored as one snapshot per version in a shared cache
+    backend (locmem in tests, Redis in production). A version pointer is flipped
+    only after the new snapshot is written, so readers never see a mix of two
+    ingestion runs, and only ever forward, so a slow publish cannot bring back
+    older prices. Each process keeps the current snapshot in memory and checks
+    the shared version at most once per ``LOCAL_TTL`` seconds.
+    """
+
+    VERSION_KEY = 'quotes:version'
+    COUNTER_KEY = 'quotes:counter'
+    # Serializes compare-and-set of VERSION_KEY; expires if its holder dies
+    POINTER_LOCK_KEY = 'quotes:version:lock'
+    POINTER_LOCK_TIMEOUT = 5
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Drop the in-process snapshot and counters"""
+        with self._lock:
+            self._version = None
+            self._quotes = {}
+            self._symbols = {}
+            self._checked_at = 0.0
+            self.hits = 0
+            self.misses = 0
+
+    @property
+    def config(self):
+        return getattr(settings, 'QUOTE_CACHE', {})
+
+    @property
+    def backend(self):
+        return caches[self.config.get('ALIAS', 'default')]
+
+    def _snapshot_key(self, version):
+        return f'quotes:{version}'
+
+    def _load_from_database(self, stock_ids=None):
+        from .models import Stock
+        from .serializers import StockSerializer
+        # Always the primary: a lagging replica must never be published as a new version
+        stocks = Stock.objects.using(DEFAULT_DB_ALIAS).order_by('id')
+        if stock_ids is not None:
+            stocks = stocks.filter(id__in=stock_ids)
+        return {
+            quote['id']: quote
+            for quote in StockSerializer(stocks, many=True).data
+        }
+
+    def _install(self, version, quotes):
+        self._version = version
+        self._quotes = quotes
+        self._symbols = {quote['symbol']: stock_id for stock_id, quote in quotes.items()}
+        self._checked_at = time.monotonic()
+
+    def publish(self):
+        """Load the universe from the database and make it the current version.
+
+        Returns the version written. If a concurrent publish already made a
+        newer version current, the pointer is left alone.
+        """
+        backend = self.backend
+        timeout = self.config.get('TIMEOUT')
+
+        # Allocate the version atomically before reading, so a higher version
+        # always holds rows read later; then write the snapshot and flip the pointer
+        backend.add(self.COUNTER_KEY, 0, None)
+        version = backend.incr(self.COUNTER_KEY)
+        quotes = self._load_from_database()
+        backend.set(self._snapshot_key(version), quotes, timeout)
+        advanced = self._advance(backend, version)
+        with self._lock:
+            if advanced:
+                self._install(version, quotes)
+            else:
+                # Pick the newer snapshot up on the next read
+                self._checked_at = 0.0
+        return version
+
+    def _advance(self, backend, version):
+        """Point VERSION_KEY at ``version`` unless it already holds a newer one"""
+        token = uuid.uuid4().hex
+        deadline = time.monotonic() + self.POINTER_LOCK_TIMEOUT
+        while not backend.add(self.POINTER_LOCK_KEY, token, self.POINTER_LOCK_TIMEOUT):
+            if time.monotonic() > deadline:
+                # The holder died; its lock has expired by now
+                break
+            time.sleep(0.005)
+        try:
+            current = backend.get(self.VERSION_KEY)
+            if current is not None and current >= version:
+                return False
+            backend.set(self.VERSION_KEY, version, None)
+            return True
+        finally:
+            if backend.get(self.POINTER_LOCK_KEY) == token:
+                backend.delete(self.POINTER_LOCK_KEY)
+
+    def _is_fresh(self, now):
+        return self._version is not None and now - self._checked_at < self.config.get('LOCAL_TTL', 1.0)
+
+    def _ensure_fresh(self):
+        now = time.monotonic()
+        if self._is_fresh(now):
+            return
+
+        backend = self.backend
+        version = backend.get(self.VERSION_KEY)
+        if version is not None and version == self._version:
+            self._checked_at = now
+            return
+
+        quotes = backend.get(self._snapshot_key(version)) if version is not None else None
+        if quotes is None:
+            # Cold or evicted cache: read through to the database
+            with self._lock:
+                self.misses += 1
+            self.publish()
+            return
+        with self._lock:
+            self._install(version, quotes)
+
+    async def _aensure_fresh(self):
+        """_ensure_fresh for async views, using the cache backend's async API"""
+        now = time.monotonic()
+        if self._is_fresh(now):
+            return
+
+        backend = self.backend
+        version = await backend.aget(self.VERSION_KEY)
+        if version is not None and version == self._version:
+            self._checked_at = now
+            return
+
+        quotes = await backend.aget(self._snapshot_key(version)) if version is not None else None
+        if quotes is None:
+            with self._lock:
+                self.misses += 1
+            await sync_to_async(self.publish)()
+            return
+        with self._lock:
+            self._install(version, quotes)
+
+    @property
+    def version(self):
+        self._ensure_fresh()
+        return self._version
+
+    def _lookup(self, stock_ids):
+        found = {}
+        missing = []
+        for stock_id in stock_ids:
+            quote = self._quotes.get(stock_id)
+            if quote is None:
+                missing.append(stock_id)
+            else:
+                found[stock_id] = quote
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def get_many(self, stock_ids):
+        """Serialized stocks (as StockSerializer renders them) keyed by id.
+
+        Ids missing from the snapshot are read through from the database in one query.
+        """
+        self._ensure_fresh()
+        found, missing = self._lookup(stock_ids)
+        if missing:
+            found.update(self._load_from_database(missing))
+        return found
+
+    async def aget_many(self, stock_ids):
+        await self._aensure_fresh()
+        found, missing = self._lookup(stock_ids)
+        if missing:
+            found.update(await sync_to_async(self._load_from_database)(missing))
+        return found
+
+    def get(self, stock_id):
+        return self.get_many([stock_id]).get(stock_id)
+
+    async def aget(self, stock_id):
+        return (await self.aget_many([stock_id])).get(stock_id)
+
+    def get_by_symbol(self, symbol):
+        self._ensure_fresh()
+        stock_id = self._symbols.get(symbol)
+        return self.get(stock_id) if stock_id is not None else None
+
+    async def aget_by_symbol(self, symbol):
+        await self._aensure_fresh()
+        stock_id = self._symbols.get(symbol)
+        return await self.aget(stock_id) if stock_id is not None else None
+
+    def price(self, stock_id):
+        """Current price as a Decimal, or None for an unknown stock"""
+        quote = self.get(stock_id)
+        return Decimal(quote['price']) if quote is not None else None
+
+    def prices(self, stock_ids):
+        return {
+            stock_id: Decimal(quote['price'])
+            for stock_id, quote in self.get_many(stock_ids).items()
+        }
+
+    def all(self):
+        """Every stock, ordered by id"""
+        self._ensure_fresh()
+        with self._lock:
+            self.hits += 1
+        return list(self._quotes.values())
+
+    async def aall(self):
+        await self._aensure_fresh()
+        with self._lock:
+            self.hits += 1
+        return list(self._quotes.values())
+
+    def stats(self):
+        return {
+            'version': self._version,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+quote_cache = QuoteCache()
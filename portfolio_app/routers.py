@@ -0,0 +1,60 @@
+# portfolio_app/routers.py
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Set for the duration of a request whose reads may be served by a replica
+_replica_reads = ContextVar('replica_reads', default=False)
+
+
+def routing_config():
+    return getattr(settings, 'DATABASE_ROUTING', {})
+
+
+def replica_aliases():
+    return routing_config().get('REPLICAS', [])
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Let reads inside the block go to a replica (when one is configured)"""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """Spread reads over DATABASE_ROUTING['REPLICAS'] where replica_reads() allows it.
+
+    Everything else, including every write, Celery task and management command,
+    uses the primary. ReplicaRoutingMiddleware enables replica reads for safe
+    requests from clients that have not written recently.
+    """
+
+    def db_for_read(self, model, **hints):
+        if _replica_reads.get():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        if db in replica_aliases():
+            return False
+        return None
@@ -5,14 +5,33 @@ from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.contrib.auth.hashers import make_password, check_password
 from rest_framework_simplejwt.tokens import RefreshToken
+from . import metrics
+from .quotes import quote_cache
 
-class StockSerializer(serializers.ModelSerializer):
+class TimedSerializerMixin:
+    """Counts output time towards the request's serialize timing (portfolio_app.metrics)"""
+
+    def to_representation(self, instance):
+        with metrics.serializing():
+            return super().to_representation(instance)
+
+class StockSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Stock
-        fields = ['id', 'symbol', 'name', 'price', 'sector']
+        fields = ['id', 'symbol', 'name', 'price', 'sector', 'listed']
+
+class CachedStockField(serializers.Field):
+    """Renders a stock id as StockSerializer would, from the quote cache"""
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
 
-class StockLotSerializer(serializers.ModelSerializer):
-    stock = StockSerializer(read_only=True)
+    def to_representation(self, value):
+        return quote_cache.get(value)
+
+class StockLotSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    stock = CachedStockField(source='stock_id')
     current_value = serializers.SerializerMethodField()
     unrealized_gain = serializers.SerializerMethodField()
     return_percentage = serializers.SerializerMethodField()
@@ -25,18 +44,21 @@ class StockLotSerializer(serializers.ModelSerializer):
             'unrealized_gain', 'return_percentage'
         ]
 
+    def _price(self, obj):
+        return quote_cache.price(obj.stock_id)
+
     def get_current_value(self, obj):
-        return obj.stock.price * obj.remaining_quantity
+        return self._price(obj) * obj.remaining_quantity
 
     def get_unrealized_gain(self, obj):
-        return (obj.stock.price - obj.purchase_price) * obj.remaining_quantity
+        return (self._price(obj) - obj.purchase_price) * obj.remaining_quantity
 
     def get_return_percentage(self, obj):
         if obj.purchase_price == 0:
             return 0
-        return ((obj.stock.price - obj.purchase_price) / obj.purchase_price) * 100
+        return ((self._price(obj) - obj.purchase_price) / obj.purchase_price) * 100
 
-class PortfolioSerializer(serializers.ModelSerializer):
+class PortfolioSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     stock_lots = StockLotSerializer(many=True, read_only=True)
     positions = serializers.SerializerMethodField()
 
@@ -45,24 +67,13 @@ class PortfolioSerializer(serializers.ModelSerializer):
         fields = ['id', 'totalValue', 'last_updated', 'stock_lots', 'positions']
 
     def get_positions(self, obj):
-        positions = []
-        stocks = Stock.objects.filter(
-            stocklot__portfolio=obj,
-            stocklot__remaining_quantity__gt=0
-        ).distinct()
-
-        for stock in stocks:
-            position = obj.calculate_position(stock)
-            positions.append({
-                'symbol': stock.symbol,
-                'name': stock.name,
-                'current_price': stock.price,
-                **position
-            })
-        return positions
-
-class TransactionSerializer(serializers.ModelSerializer):
-    stock = StockSerializer(read_only=True)
+        request = self.context.get('request')
+        include_lots = request is not None and \
+            request.query_params.get('include_lots', '').lower() in ('1', 'true')
+        return obj.get_positions(include_lots=include_lots)
+
+class TransactionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    stock = CachedStockField(source='stock_id')
     stock_symbol = serializers.CharField(write_only=True)
     lot_details = StockLotSerializer(source='lot', read_only=True)
 
@@ -126,7 +137,7 @@ class RegisterSerializer(serializers.ModelSerializer):
         
         return user
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     portfolio = PortfolioSerializer(read_only=True)
     transaction_count = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True, required=True)
@@ -141,6 +152,9 @@ class UserSerializer(serializers.ModelSerializer):
         ]
 
     def get_transaction_count(self, obj):
+        # Viewsets annotate the count up front; fall back to a query otherwise
+        if hasattr(obj, 'transaction_count'):
+            return obj.transaction_count
         return obj.transactions.count()
 
     def validate(self, data):
@@ -206,7 +220,7 @@ class LoginSerializer(serializers.Serializer):
             'refresh': str(refresh),
             'access': str(refresh.access_token),
         }
-class NewsSerializer(serializers.ModelSerializer):
+class NewsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = News
         fields = ['id', 'title', 'date', 'description', 'created_at']
\ No newline at end of file
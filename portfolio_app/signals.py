@@ -0,0 +1,63 @@
+# portfolio_app/signals.py
+from celery.signals import task_postrun, task_prerun
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from . import metrics, profiling
+from .models import News, Stock
+from .quotes import quote_cache
+
+# Celery task id -> (Timings, context token) for runs in progress
+_task_timings = {}
+# Celery task id -> Sampler for runs being profiled
+_task_samplers = {}
+
+
+@receiver(post_save, sender=Stock)
+@receiver(post_delete, sender=Stock)
+def refresh_quote_cache(sender, **kwargs):
+    """Republish quotes once a direct Stock edit commits (bulk writes publish themselves)"""
+    transaction.on_commit(quote_cache.publish)
+
+
+@receiver(post_save, sender=News)
+@receiver(post_delete, sender=News)
+def mark_news_changed(sender, **kwargs):
+    """Invalidate news list validators once a direct News edit commits"""
+    transaction.on_commit(News.mark_changed)
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Count and time every query made while a request or task is being measured"""
+    # First, so connection.execute_wrapper() blocks still pop their own wrapper
+    if metrics.record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, metrics.record_query)
+
+
+@task_prerun.connect
+def start_task_timing(task_id=None, **kwargs):
+    _task_timings[task_id] = metrics.start()
+
+
+@task_postrun.connect
+def record_task_timing(task_id=None, task=None, state=None, **kwargs):
+    started = _task_timings.pop(task_id, None)
+    if started is not None:
+        metrics.observe_task(metrics.stop(*started), task.name, state or 'UNKNOWN')
+
+
+@task_prerun.connect
+def start_task_profile(task_id=None, **kwargs):
+    if profiling.sampled('TASK_SAMPLE_RATE'):
+        _task_samplers[task_id] = profiling.Sampler().start()
+
+
+@task_postrun.connect
+def save_task_profile(task_id=None, task=None, **kwargs):
+    sampler = _task_samplers.pop(task_id, None)
+    if sampler is not None:
+        sampler.stop()
+        profiling.save('task', task.name, sampler)
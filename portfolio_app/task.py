@@ -1,31 +1,232 @@
-from django.db import models
+from django.db import transaction
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
 from celery import shared_task
+import logging
 import requests
-from .models import Stock
-import os
-import sys
-import json
-import os
-# Add the project root directory to the Python path
-@shared_task
-def update_stock_prices_task():
-    api_url = "https://data.irbe7.com/api/data/principaux"
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from . import market
+from .feeds import get_feed, parse_quote
+from .models import Portfolio, PortfolioSnapshot, PriceTick, Stock
+from .pubsub import PRICE_CHANNEL, get_broker
+from .quotes import quote_cache
+import time
+
+logger = logging.getLogger(__name__)
+
+
+def apply_price_updates(stock_data):
+    """Write changed prices from a feed payload with a single bulk_update.
+
+    Returns counts of changed, unchanged and unknown symbols, plus the list of
+    updated Stock rows and their previous prices keyed by stock id.
+    """
+    quotes = {}
+    invalid = 0
+    for item in stock_data:
+        quote = parse_quote(item)
+        if quote is None:
+            invalid += 1
+            continue
+        symbol, _, price = quote
+        quotes[symbol] = price
+
+    # One query for every symbol in the feed
+    stocks = Stock.objects.only('id', 'symbol', 'price').in_bulk(quotes.keys(), field_name='symbol')
+
+    changed = []
+    previous = {}
+    for symbol, price in quotes.items():
+        stock = stocks.get(symbol)
+        if stock is not None and stock.price != price:
+            previous[stock.id] = stock.price
+            stock.price = price
+            changed.append(stock)
+
+    if changed:
+        now = timezone.now()
+        with transaction.atomic():
+            Stock.objects.bulk_update(changed, ['price'], batch_size=500)
+            PriceTick.objects.bulk_create(
+                [PriceTick(stock=stock, timestamp=now, price=stock.price) for stock in changed],
+                batch_size=500
+            )
+
+    return {
+        'changed': len(changed),
+        'unchanged': len(stocks) - len(changed),
+        'unknown': len(quotes) - len(stocks),
+        'invalid': invalid,
+        'stocks': changed,
+        'previous': previous,
+    }
+
+
+def publish_price_deltas(result, version):
+    """Fan the changed prices out to price stream subscribers in one message"""
+    get_broker().publish(PRICE_CHANNEL, {
+        'version': version,
+        'timestamp': timezone.now().isoformat(),
+        'prices': {
+            stock.symbol: {
+                'price': str(stock.price),
+                'previous': str(result['previous'][stock.id]),
+            }
+            for stock in result['stocks']
+        },
+    })
+
 
+def apply_feed(stock_data):
+    """Apply a feed payload, then revalue portfolios and notify subscribers of changes"""
+    result = apply_price_updates(stock_data)
+
+    # Portfolio values are stale until revalued against the new prices
+    if result['changed']:
+        version = quote_cache.publish()
+        revalue_portfolios_task.delay()
+        publish_price_deltas(result, version)
+
+    return {key: value for key, value in result.items() if key not in ('stocks', 'previous')}
+
+
+# Shared poll bookkeeping (PRICE_POLLING['CACHE_ALIAS']), written only under the lock
+POLL_STATE_KEY = 'price-poll:state'
+POLL_LOCK_KEY = 'price-poll:lock'
+
+
+def _poll_cache():
+    return caches[market.polling_config().get('CACHE_ALIAS', 'default')]
+
+
+@contextmanager
+def single_flight(key, timeout):
+    """Hold a shared cache lock for the block; yields False if another run holds it.
+
+    The timeout frees the lock of a worker that died mid-run.
+    """
+    cache = _poll_cache()
+    token = uuid.uuid4().hex
+    acquired = cache.add(key, token, timeout)
     try:
-        response = requests.get(api_url)
-        response.raise_for_status()
-        stock_data = response.json()
-
-        for item in stock_data:
-            symbol = item['referentiel']['ticker']
-            price = item['referentiel']['last']
-
-            try:
-                stock = Stock.objects.get(symbol=symbol)
-                stock.price = price
-                stock.save()
-            except Stock.DoesNotExist:
+        yield acquired
+    finally:
+        if acquired and cache.get(key) == token:
+            cache.delete(key)
+
+
+def backoff_delay(failures):
+    """Seconds to wait after ``failures`` consecutive upstream errors"""
+    config = market.polling_config()
+    return min(config.get('BACKOFF_BASE', 30) * 2 ** (failures - 1), config.get('BACKOFF_MAX', 900))
+
+
+def poll_skip_reason(state, now):
+    """Why a scheduled poll should not reach the feed now, or None"""
+    if now < state.get('retry_at', 0):
+        return 'backing off'
+    if not market.in_session() and now - state.get('polled_at', 0) < market.poll_interval():
+        return 'outside trading hours'
+    return None
+
+
+@shared_task
+def update_stock_prices_task(source=None, scheduled=False):
+    """Fetch the feed and apply changed prices; runs never overlap.
+
+    Beat runs it with ``scheduled=True`` every SESSION_INTERVAL seconds. Such
+    runs reach the feed only at the trading-hours cadence, back off
+    exponentially after upstream failures and ask the feed for changes only,
+    so an unchanged feed costs a 304 and no writes.
+    """
+    with single_flight(POLL_LOCK_KEY, market.polling_config().get('LOCK_TIMEOUT', 300)) as acquired:
+        if not acquired:
+            return {'skipped': 'already running'}
+
+        feed = get_feed(source)
+        if not scheduled:
+            return apply_feed(feed.fetch())
+
+        cache = _poll_cache()
+        state = cache.get(POLL_STATE_KEY) or {}
+        now = time.time()
+        reason = poll_skip_reason(state, now)
+        if reason is not None:
+            return {'skipped': reason}
+
+        try:
+            stock_data, validators = feed.fetch_if_changed(state.get('validators'))
+        except requests.exceptions.RequestException:
+            failures = state.get('failures', 0) + 1
+            cache.set(POLL_STATE_KEY, {**state, 'failures': failures, 'retry_at': now + backoff_delay(failures)}, None)
+            raise
+
+        cache.set(POLL_STATE_KEY, {'polled_at': now, 'validators': validators}, None)
+        if stock_data is None:
+            return {'unchanged': True}
+        return apply_feed(stock_data)
+
+
+@shared_task
+def revalue_portfolios_task():
+    """Recompute totalValue for every portfolio in a single set-based pass"""
+    started = time.perf_counter()
+    changed = Portfolio.revalue_all()
+    duration = time.perf_counter() - started
+
+    logger.info("Revalued portfolios: %d changed in %.3fs", changed, duration)
+    return {
+        'changed': changed,
+        'duration_seconds': round(duration, 3),
+    }
+
+
+# Cutoff reached by the last rollup of each unit, in the PRICE_POLLING cache
+ROLLUP_STATE_KEY = 'price-rollup:{unit}'
+
+
+@shared_task
+def rollup_price_ticks_task():
+    """Compact old price ticks into coarser OHLC bars so history stays bounded.
+
+    Each unit only scans the ticks between its previous cutoff and the new
+    one; without a recorded cutoff (first run, flushed cache) it scans all
+    older ticks once.
+    """
+    now = timezone.now()
+    cache = _poll_cache()
+    deleted = {}
+    for unit, age in getattr(settings, 'PRICE_HISTORY_ROLLUP', {}).items():
+        # Align the cutoff to a bucket boundary so no bucket is split
+        cutoff = now - timedelta(**age)
+        cutoff = cutoff.replace(minute=0, second=0, microsecond=0)
+        if unit != 'hour':
+            cutoff = cutoff.replace(hour=0)
+        if unit == 'week':
+            cutoff -= timedelta(days=cutoff.weekday())
+
+        key = ROLLUP_STATE_KEY.format(unit=unit)
+        ticks = PriceTick.objects.filter(timestamp__lt=cutoff)
+        previous = cache.get(key)
+        if previous is not None:
+            if previous >= cutoff:
+                deleted[unit] = 0
                 continue
+            ticks = ticks.filter(timestamp__gte=previous)
+        deleted[unit] = ticks.compact(unit)
+        cache.set(key, cutoff, None)
+    return deleted
 
-    except requests.exceptions.RequestException as e:
-        print(f"Error updating stock prices: {e}")
+
+@shared_task
+def snapshot_portfolios_task():
+    """Record a (cash, stock value) snapshot of every portfolio for equity curves"""
+    started = time.perf_counter()
+    created = PortfolioSnapshot.capture_all()
+    return {
+        'created': created,
+        'duration_seconds': round(time.perf_counter() - started, 3),
+    }
@@ -1,3 +1,1315 @@
-from django.test import TestCase
+import asyncio
+import base64
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock
+from zoneinfo import ZoneInfo
 
-# Create your tests here.
+import numpy as np
+import requests
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from stock_portfolio_project.celery import app as celery_app
+
+from . import market, metrics, news_stream, performance, profiling
+from .async_views import price_events
+from .authentication import revocations
+from .benchmarks import BenchmarkData, compare, run_suite
+from .middleware import ReplicaRoutingMiddleware
+from .models import (
+    News, Portfolio, PortfolioSnapshot, Position, PriceTick, Stock, StockLot, Transaction, User
+)
+from .pubsub import InMemoryBroker, get_broker
+from .quotes import QuoteCache, quote_cache
+from .task import (
+    POLL_LOCK_KEY, apply_price_updates, publish_price_deltas, revalue_portfolios_task, rollup_price_ticks_task,
+    update_stock_prices_task
+)
+from .views import generate_tokens
+
+LOCMEM_CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'quotes': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'quotes'},
+    'auth': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'auth'},
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryCountTests(TestCase):
+    """Endpoints must issue a bounded number of queries whatever the data volume"""
+
+    # Upper bound on queries per request for each endpoint, with a warm quote cache.
+    # News and positions include the conditional GET validator lookup.
+    MAX_QUERIES = {
+        '/api/stocks/': 0,
+        '/api/news/': 2,
+        '/api/users/': 3,
+        '/api/users/{user}/': 3,
+        '/api/users/{user}/transaction_history/': 2,
+        '/api/portfolios/': 3,
+        '/api/portfolios/{portfolio}/': 3,
+        '/api/portfolios/{portfolio}/positions/': 3,
+        '/api/portfolios/{portfolio}/positions/?include_lots=true': 4,
+        '/api/transactions/': 1,
+    }
+
+    def setUp(self):
+        quote_cache.reset()
+        self.client = APIClient()
+        self.user_count = 0
+        self.stock_count = 0
+
+    def add_data(self, users, stocks, lots_per_stock):
+        """Create users trading their own stocks, with one partial sell each"""
+        for _ in range(users):
+            self.user_count += 1
+            portfolio = Portfolio.objects.create(cash_balance=Decimal('1000000'))
+            portfolio.refresh_from_db()
+            user = User.objects.create(
+                username=f'user{self.user_count}',
+                email=f'user{self.user_count}@example.com',
+                password='secret',
+                language='fr',
+                portfolio=portfolio
+            )
+            for _ in range(stocks):
+                self.stock_count += 1
+                stock = Stock.objects.create(
+                    symbol=f'S{self.stock_count}',
+                    name=f'Stock {self.stock_count}',
+                    price=Decimal('12.50'),
+                    sector='Unknown'
+                )
+                for _ in range(lots_per_stock):
+                    portfolio.buy_stock(stock, 10, Decimal('10.00'))
+                portfolio.sell_stock(stock, 15, Decimal('11.00'))
+            News.objects.create(title=f'News {self.user_count}', date='2024-01-01', description='...')
+        # Stock signals publish on commit, which never happens inside a TestCase
+        quote_cache.publish()
+        return user
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, url)
+        return len(context)
+
+    def assert_bounded(self, user):
+        for template, limit in self.MAX_QUERIES.items():
+            url = template.format(user=user.id, portfolio=user.portfolio_id)
+            with self.subTest(url=url):
+                self.assertLessEqual(self.count_queries(url), limit)
+
+    def test_query_count_is_bounded(self):
+        self.assert_bounded(self.add_data(users=1, stocks=1, lots_per_stock=2))
+
+    def test_query_count_does_not_grow_with_data(self):
+        user = self.add_data(users=1, stocks=1, lots_per_stock=2)
+        small = {template: self.count_queries(template.format(user=user.id, portfolio=user.portfolio_id))
+                 for template in self.MAX_QUERIES}
+
+        user = self.add_data(users=4, stocks=5, lots_per_stock=4)
+        for template, count in small.items():
+            url = template.format(user=user.id, portfolio=user.portfolio_id)
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), count)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BatchOrderTests(TestCase):
+    """POST /portfolios/{id}/orders/ fills what it can, in a constant number of queries"""
+
+    def setUp(self):
+        quote_cache.reset()
+        self.client = APIClient()
+        self.portfolio = Portfolio.objects.create(cash_balance=Decimal('1000'))
+        self.portfolio.refresh_from_db()
+        User.objects.create(
+            username='trader', email='trader@example.com', password='secret', language='fr', portfolio=self.portfolio
+        )
+        self.stocks = [
+            Stock.objects.create(symbol=f'B{index}', name=f'Stock {index}', price=Decimal('10.00'), sector='Unknown')
+            for index in range(3)
+        ]
+        # Stock signals publish on commit, which never happens inside a TestCase
+        quote_cache.publish()
+
+    def post_orders(self, orders):
+        return self.client.post(
+            f'/api/portfolios/{self.portfolio.id}/orders/', {'orders': orders}, format='json'
+        )
+
+    def count_batch_queries(self, orders):
+        with CaptureQueriesContext(connection) as context:
+            response = self.post_orders(orders)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['failed'], 0)
+        return len(context)
+
+    def test_query_count_does_not_grow_with_batch_size(self):
+        for stock in self.stocks:
+            self.portfolio.buy_stock(stock, 40, Decimal('1.00'))
+
+        def batch(size):
+            return [
+                {'side': side, 'symbol': stock.symbol, 'quantity': 1, 'price': '1.00'}
+                for _ in range(size // 2)
+                for stock in self.stocks[:2]
+                for side in ('buy', 'sell')
+            ][:size]
+
+        self.assertEqual(self.count_batch_queries(batch(2)), self.count_batch_queries(batch(20)))
+
+    def test_failed_orders_do_not_affect_the_rest(self):
+        first, second, _ = self.stocks
+        response = self.post_orders([
+            {'side': 'buy', 'symbol': first.symbol, 'quantity': 50, 'price': '10.00'},
+            {'side': 'buy', 'symbol': second.symbol, 'quantity': 60, 'price': '10.00'},
+            {'side': 'sell', 'symbol': second.symbol, 'quantity': 1, 'price': '10.00'},
+            {'side': 'sell', 'symbol': first.symbol, 'quantity': 20, 'price': '12.00'},
+            {'side': 'buy', 'symbol': 'MISSING', 'quantity': 1, 'price': '1.00'},
+            {'side': 'buy', 'symbol': first.symbol, 'price': '1.00'},
+        ])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            [result['status'] for result in response.data['results']],
+            ['filled', 'failed', 'failed', 'filled', 'failed', 'failed'],
+        )
+        errors = [result.get('error') for result in response.data['results']]
+        self.assertEqual(errors[1], 'Insufficient funds for this purchase')
+        self.assertEqual(errors[2], 'Not enough shares. You only have 0 shares available.')
+        self.assertEqual(errors[4], 'Stock not found')
+        self.assertEqual(errors[5], "Missing field: 'quantity'")
+        self.assertEqual(response.data['results'][3]['realized_gain'], Decimal('40.00'))
+        self.assertEqual((response.data['filled'], response.data['failed']), (2, 4))
+
+        # 1000 - 50 * 10 + 20 * 12
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cash_balance, Decimal('740.00'))
+        self.assertEqual(self.portfolio.totalValue, Decimal('1040.00'))
+        self.assertEqual(
+            list(Position.objects.filter(portfolio=self.portfolio).values_list('stock__symbol', 'shares', 'total_cost')),
+            [(first.symbol, 30, Decimal('300.00'))],
+        )
+        self.assertEqual(Transaction.objects.filter(type='SELL').get().lot.remaining_quantity, 30)
+
+    def test_invalid_prices_fail_only_their_order(self):
+        stock = self.stocks[0]
+        response = self.post_orders([
+            {'side': side, 'symbol': stock.symbol, 'quantity': 1, 'price': price}
+            for side in ('buy', 'sell')
+            for price in ('NaN', 'Infinity', '-Infinity', '0', '-500')
+        ] + [{'side': 'buy', 'symbol': stock.symbol, 'quantity': 1, 'price': '10.00'}])
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['filled'], response.data['failed']), (1, 10))
+        self.assertEqual(
+            {result.get('error') for result in response.data['results'][:-1]}, {'Price must be a positive number'}
+        )
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cash_balance, Decimal('990.00'))
+
+    def test_sells_consume_lots_bought_earlier_in_the_batch(self):
+        stock = self.stocks[0]
+        self.portfolio.buy_stock(stock, 5, Decimal('8.00'))
+        response = self.post_orders([
+            {'side': 'buy', 'symbol': stock.symbol, 'quantity': 10, 'price': '9.00'},
+            {'side': 'sell', 'symbol': stock.symbol, 'quantity': 15, 'price': '10.00'},
+        ])
+
+        self.assertEqual(response.data['filled'], 2)
+        self.assertEqual(response.data['results'][1]['realized_gain'], Decimal('20.00'))
+        self.assertEqual(
+            [(sale['quantity'], Decimal(sale['price'])) for sale in response.data['results'][1]['transactions']],
+            [(5, Decimal('10.00')), (10, Decimal('10.00'))],
+        )
+        self.assertFalse(StockLot.objects.open().exists())
+        self.assertFalse(Position.objects.exists())
+        self.portfolio.refresh_from_db()
+        self.assertEqual(self.portfolio.cash_balance, Decimal('1020.00'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SellStockTests(TestCase):
+    """FIFO sells cost the same number of queries however many lots they consume"""
+
+    def setUp(self):
+        quote_cache.reset()
+        self.portfolio = Portfolio.objects.create(cash_balance=Decimal('100000'))
+        self.portfolio.refresh_from_db()
+        User.objects.create(
+            username='seller', email='seller@example.com', password='secret', language='fr', portfolio=self.portfolio
+        )
+
+    def stock_with_lots(self, symbol, lots):
+        stock = Stock.objects.create(symbol=symbol, name=symbol, price=Decimal('10.00'), sector='Unknown')
+        for index in range(lots):
+            self.portfolio.buy_stock(stock, 2, Decimal(10 + index))
+        return stock
+
+    def count_sell_queries(self, stock, quantity):
+        with CaptureQueriesContext(connection) as context:
+            self.portfolio.sell_stock(stock, quantity, Decimal('20.00'))
+        return len(context)
+
+    def test_query_count_does_not_grow_with_lots(self):
+        few = self.stock_with_lots('FEW', 3)
+        many = self.stock_with_lots('MANY', 30)
+        self.assertEqual(self.count_sell_queries(few, 6), self.count_sell_queries(many, 60))
+
+    def test_fifo(self):
+        stock = self.stock_with_lots('FIFO', 3)
+        realized_gain, transactions = self.portfolio.sell_stock(stock, 3, Decimal('20.00'))
+
+        # Two shares bought at 10, then one of the two bought at 11
+        self.assertEqual(realized_gain, Decimal('29.00'))
+        self.assertEqual([(sale.quantity, sale.lot.purchase_price) for sale in transactions],
+                         [(2, Decimal('10.00')), (1, Decimal('11.00'))])
+        lots = StockLot.objects.filter(stock=stock).order_by('purchase_date', 'id')
+        self.assertEqual(list(lots.values_list('remaining_quantity', flat=True)), [0, 1, 2])
+        self.assertEqual(Position.objects.get(stock=stock).shares, 3)
+        with self.assertRaisesMessage(ValueError, 'You only have 3 shares available'):
+            self.portfolio.sell_stock(stock, 4, Decimal('20.00'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class QueryPlanTests(TestCase):
+    """Hot lookups must be answered from an index, never a sequential scan"""
+
+    @classmethod
+    def setUpTestData(cls):
+        stocks = Stock.objects.bulk_create([
+            Stock(symbol=f'S{i}', name=f'Stock {i}', price=Decimal('10.00'), sector='Unknown')
+            for i in range(20)
+        ])
+        portfolios = [Portfolio.objects.create() for _ in range(10)]
+        users = User.objects.bulk_create([
+            User(username=f'user{i}', email=f'user{i}@example.com', password='secret',
+                 language='fr', portfolio=portfolio)
+            for i, portfolio in enumerate(portfolios)
+        ])
+        lots = StockLot.objects.bulk_create([
+            StockLot(portfolio=portfolio, stock=stock, purchase_price=Decimal('9.00'),
+                     quantity=10, remaining_quantity=(10 if i % 3 else 0))
+            for portfolio in portfolios
+            for i, stock in enumerate(stocks)
+        ])
+        Transaction.objects.bulk_create([
+            Transaction(user=user, type='BUY', stock=lot.stock, quantity=10,
+                        price=Decimal('9.00'), lot=lot)
+            for user, lot in zip(users * 20, lots)
+        ])
+        News.objects.bulk_create([
+            News(title=f'News {i}', date=date(2024, 1, 1) + timedelta(days=i), description='...')
+            for i in range(200)
+        ])
+        now = timezone.now()
+        PriceTick.objects.bulk_create([
+            PriceTick(stock=stock, timestamp=now - timedelta(minutes=i), price=Decimal('10.00'))
+            for stock in stocks
+            for i in range(20)
+        ])
+        PortfolioSnapshot.objects.bulk_create([
+            PortfolioSnapshot(portfolio=portfolio, timestamp=now - timedelta(days=i),
+                              cash_balance=Decimal('10000.00'), stock_value=Decimal('0.00'))
+            for portfolio in portfolios
+            for i in range(20)
+        ])
+        cls.portfolio = portfolios[0]
+        cls.user = users[0]
+        cls.stock = stocks[1]
+
+    def assert_indexed(self, queryset, ordered_scan=False):
+        """Fail if ``queryset`` reads its table without an index key lookup.
+
+        ``ordered_scan`` allows walking a whole index in order, which is the
+        right plan for a LIMIT-ed page with no filter.
+        """
+        table = queryset.model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                # Tiny tables always favour a seq scan; disabling it shows whether an index is usable
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            elif connection.vendor == 'sqlite':
+                cursor.execute('ANALYZE')
+        plan = queryset.explain()
+
+        if connection.vendor == 'postgresql':
+            regressed = f'Seq Scan on {table}' in plan or (
+                not ordered_scan and 'Index Cond' not in plan and 'Recheck Cond' not in plan
+            )
+        elif connection.vendor == 'sqlite':
+            regressed = any(
+                line.split('SCAN ', 1)[1].split()[0] == table
+                and not (ordered_scan and 'INDEX' in line)
+                for line in plan.splitlines() if 'SCAN ' in line
+            )
+        else:
+            self.skipTest(f'No plan checks for {connection.vendor}')
+        self.assertFalse(regressed, f'Sequential scan on {table}:\n{plan}')
+
+    def test_open_lots_fifo(self):
+        self.assert_indexed(StockLot.objects.filter(
+            portfolio=self.portfolio, stock=self.stock, remaining_quantity__gt=0
+        ).order_by('purchase_date'))
+
+    def test_transactions_by_user(self):
+        self.assert_indexed(
+            Transaction.objects.filter(user=self.user).order_by('-date', '-id')[:50]
+        )
+
+    def test_transactions_page(self):
+        self.assert_indexed(Transaction.objects.order_by('-date', '-id')[:50], ordered_scan=True)
+
+    def test_news_by_title_and_date(self):
+        self.assert_indexed(News.objects.filter(title='News 5', date=date(2024, 1, 6)))
+
+    def test_news_by_date_range(self):
+        self.assert_indexed(News.objects.filter(
+            date__gte=date(2024, 2, 1), date__lte=date(2024, 3, 1)
+        ).order_by('-date', '-id')[:50])
+
+    def test_open_positions(self):
+        self.assert_indexed(Position.objects.filter(portfolio=self.portfolio, shares__gt=0))
+
+    def test_price_ticks_by_stock(self):
+        self.assert_indexed(PriceTick.objects.filter(
+            stock=self.stock, timestamp__gte=timezone.now() - timedelta(hours=1)
+        ))
+
+    def test_snapshots_by_portfolio(self):
+        self.assert_indexed(PortfolioSnapshot.objects.filter(
+            portfolio=self.portfolio, timestamp__gte=timezone.now() - timedelta(days=7)
+        ).order_by('timestamp'))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class NewsSearchTests(TestCase):
+    """?q= returns matching news, best match first, across keyset pages"""
+
+    @classmethod
+    def setUpTestData(cls):
+        News.objects.bulk_create([
+            News(title='Bourse de Tunis', date=date(2024, 1, 1), description='Le marché recule'),
+            News(title='Résultats annuels', date=date(2024, 1, 2), description='La bourse salue les résultats'),
+            News(title='Météo', date=date(2024, 1, 3), description='Soleil sur Tunis'),
+        ] + [
+            News(title=f'Bourse {i}', date=date(2024, 2, 1) + timedelta(days=i), description='...')
+            for i in range(5)
+        ])
+
+    def test_ranked_matches(self):
+        response = APIClient().get('/api/news/', {'q': 'bourse tunis'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['title'] for item in response.data['results']], ['Bourse de Tunis'])
+
+    def test_pages_cover_all_matches(self):
+        client = APIClient()
+        response = client.get('/api/news/', {'q': 'bourse', 'page_size': 3})
+        titles = [item['title'] for item in response.data['results']]
+        while response.data['next']:
+            response = client.get(response.data['next'])
+            titles += [item['title'] for item in response.data['results']]
+        self.assertEqual(len(titles), 7)
+        self.assertEqual(len(set(titles)), 7)
+        self.assertEqual(titles[-1], 'Résultats annuels')
+
+
+class NewsStreamTests(SimpleTestCase):
+    """News dumps are parsed item by item and every reject is counted"""
+
+    ITEMS = [
+        {'title': 'Résultats annuels', 'date': '02/01/2024', 'description': 'Hausse du bénéfice'},
+        {'title': 'Dividende', 'date': '15/03/2023', 'description': 'Détachement'},
+        {'title': 'Assemblée', 'date': '01/06/2024', 'description': 'AGO'},
+    ]
+
+    def parse(self, text, chunk_size=8):
+        # Tiny chunks make items straddle read boundaries
+        with mock.patch.object(news_stream, '_CHUNK_SIZE', chunk_size):
+            return list(news_stream.iter_json_items(io.StringIO(text)))
+
+    def test_json_lines(self):
+        text = '\n\n'.join(json.dumps(item, ensure_ascii=False) for item in self.ITEMS) + '\n'
+        self.assertEqual(self.parse(text), self.ITEMS)
+        self.assertEqual(self.parse(text.rstrip('\n')), self.ITEMS)
+
+    def test_json_array(self):
+        text = '  ' + json.dumps(self.ITEMS, ensure_ascii=False, indent=2)
+        self.assertEqual(self.parse(text), self.ITEMS)
+        self.assertEqual(self.parse(text, chunk_size=64 * 1024), self.ITEMS)
+        self.assertEqual(self.parse('[]'), [])
+        self.assertEqual(self.parse(''), [])
+
+    def test_truncated_array_raises(self):
+        with self.assertRaises(ValueError):
+            self.parse(json.dumps(self.ITEMS)[:-10])
+
+    def test_rejects_are_counted(self):
+        items = [
+            *self.ITEMS,
+            ['not', 'an', 'object'],
+            {'title': 'No description', 'date': '01/01/2024'},
+            {'title': ['Not', 'text'], 'date': '01/01/2024', 'description': 'x'},
+            {'title': 'Numeric description', 'date': '01/01/2024', 'description': 42},
+            {'title': 'Bad date', 'date': '2024-01-01', 'description': 'x'},
+            {'title': 'Old', 'date': '31/12/2022', 'description': 'x'},
+            {'title': 'x' * (news_stream.TITLE_MAX_LENGTH + 1), 'date': '01/01/2024', 'description': 'x'},
+        ]
+        stats = Counter()
+        valid = list(news_stream.validate_news(items, stats))
+
+        self.assertEqual([item['title'] for item in valid], [item['title'] for item in self.ITEMS])
+        self.assertEqual(valid[0]['date'], date(2024, 1, 2))
+        self.assertEqual(stats, Counter(
+            read=10, valid=3, missing_fields=2, invalid_type=2, invalid_date=1, before_cutoff=1, title_too_long=1
+        ))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class KeysetPaginationTests(TestCase):
+    """Cursor pages walk the whole ordering exactly once, ties included"""
+
+    def setUp(self):
+        self.client = APIClient()
+        # Several items share a date, so pages must break ties on id
+        News.objects.bulk_create([
+            News(title=f'News {index}', date=date(2024, 1, 1 + index % 3), description='...')
+            for index in range(11)
+        ])
+        self.expected = list(News.objects.order_by('-date', '-id').values_list('id', flat=True))
+
+    def walk(self, url, direction):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(item['id'] for item in response.data['results'])
+            url = response.data[direction]
+            pages += 1
+        return ids, pages, response
+
+    def test_pages_forward_and_back(self):
+        ids, pages, last = self.walk('/api/news/?page_size=3', 'next')
+        self.assertEqual(ids, self.expected)
+        self.assertEqual(pages, 4)
+        self.assertIsNone(last.data['next'])
+
+        back = last.data['previous']
+        ids, _, first = self.walk(back, 'previous')
+        # Walking back visits every earlier page once and ends on the first
+        self.assertEqual(sorted(ids), sorted(self.expected[:9]))
+        self.assertEqual([item['id'] for item in first.data['results']], self.expected[:3])
+        self.assertIsNone(first.data['previous'])
+
+    def test_new_rows_do_not_shift_pages(self):
+        response = self.client.get('/api/news/?page_size=4')
+        News.objects.create(title='Breaking', date=date(2024, 1, 3), description='...')
+        second = self.client.get(response.data['next'])
+        self.assertEqual([item['id'] for item in second.data['results']], self.expected[4:8])
+
+    @staticmethod
+    def cursor(payload):
+        return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+    def test_invalid_cursors(self):
+        dated = [
+            {'p': ['notadate', 1], 'r': False},
+            {'p': [{}, 1], 'r': False},
+            {'p': ['2024-01-01', 'x'], 'r': False},
+            {'p': ['2024-01-01', None], 'r': False},
+            {'p': 'ab', 'r': False},
+            {'p': [1], 'r': False},
+            {'x': 1},
+            ['p', 'r'],
+        ]
+        cases = [('/api/news/', cursor) for cursor in ('garbage', 'bm90IGpzb24=')]
+        cases += [(url, self.cursor(payload)) for url in ('/api/news/', '/api/transactions/') for payload in dated]
+        cases += [
+            ('/api/users/', self.cursor(payload))
+            for payload in ({'p': ['x'], 'r': False}, {'p': [{}], 'r': False}, {'p': 'a', 'r': False})
+        ]
+        for url, cursor in cases:
+            with self.subTest(url=url, cursor=cursor):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(str(response.data['detail']), 'Invalid cursor')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ImportNewsTests(TestCase):
+    """News dumps import in batches and count each kind of duplicate and reject"""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def write_dump(self, name, titles):
+        items = [{'title': title, 'date': '01/02/2024', 'description': 'x'} for title in titles]
+        with open(os.path.join(self.directory, name), 'w', encoding='utf-8') as file:
+            file.write('\n'.join(json.dumps(item) for item in items))
+
+    def test_parallel_import_counts_duplicates(self):
+        self.write_dump('a.jsonl', [f'A{index}' for index in range(25)] + ['A0', 'Shared'])
+        self.write_dump('b.jsonl', [f'B{index}' for index in range(10)] + ['Shared'])
+        News.objects.create(title='B0', date=date(2024, 2, 1), description='x')
+
+        out = io.StringIO()
+        call_command('import_news', self.directory, batch_size=4, workers=2, stdout=out)
+
+        self.assertEqual(News.objects.count(), 36)
+        report = out.getvalue()
+        self.assertIn('- 2 files, 38 items read, 38 valid', report)
+        self.assertIn('- 35 new items imported', report)
+        self.assertIn('- 1 items repeated within a file', report)
+        self.assertIn('- 1 items duplicated across files', report)
+        self.assertIn('- 1 items skipped (already existed)', report)
+
+    def test_single_file_streams_in_batches(self):
+        items = [{'title': f'S{index}', 'date': '01/02/2024', 'description': 'x'} for index in range(4)] + [
+            {'title': 'S0', 'date': '01/02/2024', 'description': 'x'},
+            {'title': 'Existing', 'date': '01/02/2024', 'description': 'x'},
+            {'title': 'No description', 'date': '01/02/2024'},
+            {'title': 7, 'date': '01/02/2024', 'description': 'x'},
+            {'title': 'Bad date', 'date': '2024-02-01', 'description': 'x'},
+            {'title': 'Too old', 'date': '01/02/2020', 'description': 'x'},
+            {'title': 'T' * 300, 'date': '01/02/2024', 'description': 'x'},
+        ]
+        path = os.path.join(self.directory, 'single.json')
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(items, file)
+        News.objects.create(title='Existing', date=date(2024, 2, 1), description='x')
+
+        out = io.StringIO()
+        # Small reads so items straddle chunk boundaries
+        with mock.patch.object(news_stream, '_CHUNK_SIZE', 16):
+            call_command('import_news', path, batch_size=2, stdout=out)
+
+        self.assertEqual(
+            set(News.objects.values_list('title', flat=True)),
+            {'S0', 'S1', 'S2', 'S3', 'Existing'},
+        )
+        report = out.getvalue()
+        self.assertIn('- 1 files, 11 items read, 6 valid', report)
+        self.assertIn('- 4 new items imported in 3 batches', report)
+        self.assertIn('- 2 items skipped (already existed)', report)
+        for reason in ('missing fields', 'invalid type', 'invalid date', 'before cutoff', 'title too long'):
+            self.assertIn(f'- 1 items rejected ({reason})', report)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, QUOTE_CACHE={'ALIAS': 'quotes', 'LOCAL_TTL': 0})
+class QuoteCacheTests(TestCase):
+    """Quote snapshots are versioned and follow Stock writes"""
+
+    def setUp(self):
+        caches['quotes'].clear()
+        # The pointer is moved past the counter below; leave a clean cache for other tests
+        self.addCleanup(caches['quotes'].clear)
+        quote_cache.reset()
+        self.stock = Stock.objects.create(symbol='QC', name='Quoted', price=Decimal('10.00'), sector='Unknown')
+
+    def test_versions_only_move_forward(self):
+        first = quote_cache.publish()
+        self.assertEqual(quote_cache.publish(), first + 1)
+        self.assertEqual(caches['quotes'].get(QuoteCache.VERSION_KEY), first + 1)
+
+        # A publish that finishes after a newer one must not roll the pointer back
+        newer = first + 10
+        caches['quotes'].set(f'quotes:{newer}', {self.stock.id: {**quote_cache.get(self.stock.id), 'price': '12.00'}})
+        caches['quotes'].set(QuoteCache.VERSION_KEY, newer)
+        self.assertEqual(quote_cache.publish(), first + 2)
+        self.assertEqual(caches['quotes'].get(QuoteCache.VERSION_KEY), newer)
+        self.assertEqual(quote_cache.version, newer)
+        self.assertEqual(quote_cache.price(self.stock.id), Decimal('12.00'))
+
+    def test_interleaved_publishers_keep_the_later_read(self):
+        quote_cache.publish()
+        price_task = QuoteCache()
+        load = quote_cache._load_from_database
+
+        def slow_load(*args, **kwargs):
+            # The price task changes a price and publishes while this read is in flight
+            quotes = load(*args, **kwargs)
+            Stock.objects.filter(pk=self.stock.pk).update(price=Decimal('11.00'))
+            price_task.publish()
+            return quotes
+
+        with mock.patch.object(quote_cache, '_load_from_database', slow_load):
+            quote_cache.publish()
+
+        self.assertEqual(caches['quotes'].get(QuoteCache.VERSION_KEY), price_task.version)
+        self.assertEqual(quote_cache.price(self.stock.id), Decimal('11.00'))
+
+    def test_stock_writes_republish(self):
+        quote_cache.publish()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.price = Decimal('11.00')
+            self.stock.save()
+        self.assertEqual(quote_cache.price(self.stock.id), Decimal('11.00'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = Stock.objects.create(symbol='QC2', name='Other', price=Decimal('5.00'), sector='Unknown')
+        self.assertEqual(quote_cache.get_by_symbol('QC2')['id'], other.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.stock.delete()
+        self.assertIsNone(quote_cache.get_by_symbol('QC'))
+        self.assertEqual([quote['symbol'] for quote in quote_cache.all()], ['QC2'])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ConditionalGetTests(TestCase):
+    """Unchanged polls get a 304 from a single cheap lookup"""
+
+    def setUp(self):
+        quote_cache.reset()
+        self.client = APIClient()
+        self.stock = Stock.objects.create(symbol='S1', name='Stock 1', price=Decimal('10.00'), sector='Unknown')
+        self.portfolio = Portfolio.objects.create(cash_balance=Decimal('10000'))
+        self.portfolio.refresh_from_db()
+        News.objects.create(title='News', date='2024-01-01', description='...')
+        quote_cache.publish()
+
+    def revalidate(self, url, max_queries):
+        etag = self.client.get(url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304, url)
+        self.assertLessEqual(len(context), max_queries, url)
+        return etag
+
+    def test_stocks(self):
+        etag = self.revalidate('/api/stocks/', 0)
+        self.revalidate(f'/api/stocks/{self.stock.id}/', 0)
+        quote_cache.publish()
+        self.assertEqual(self.client.get('/api/stocks/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_news(self):
+        news = News.objects.get()
+        changes = [
+            lambda: News.objects.create(title='Later news', date='2024-01-02', description='...'),
+            lambda: News.objects.filter(pk=news.pk).get().save(update_fields=['title']),
+            lambda: News.objects.filter(title='Later news').delete(),
+        ]
+        for change in changes:
+            etag = self.revalidate('/api/news/', 0)
+            # Two changes within one clock tick must still differ
+            time.sleep(0.001)
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+            self.assertEqual(self.client.get('/api/news/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_positions(self):
+        url = f'/api/portfolios/{self.portfolio.id}/positions/'
+        etag = self.revalidate(url, 1)
+        self.portfolio.buy_stock(self.stock, 5, Decimal('10.00'))
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(self.client.get('/api/portfolios/0/positions/').status_code, 404)
+
+    def test_positions_follow_quotes(self):
+        url = f'/api/portfolios/{self.portfolio.id}/positions/'
+        self.portfolio.buy_stock(self.stock, 5, Decimal('10.00'))
+        response = self.client.get(url)
+        # A new quote version revalues positions without touching the portfolio row
+        Stock.objects.filter(pk=self.stock.pk).update(price=Decimal('12.00'))
+        quote_cache.publish()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AsyncReadTests(TestCase):
+    """Async read endpoints return the same bodies as their DRF counterparts"""
+
+    def setUp(self):
+        quote_cache.reset()
+        self.stock = Stock.objects.create(symbol='S1', name='Stock 1', price=Decimal('12.50'), sector='Unknown')
+        self.portfolio = Portfolio.objects.create(cash_balance=Decimal('10000'))
+        self.portfolio.refresh_from_db()
+        self.portfolio.buy_stock(self.stock, 10, Decimal('10.00'))
+        for i in range(3):
+            News.objects.create(title=f'News {i}', date=date(2024, 1, 1 + i), description='...')
+        quote_cache.publish()
+
+    async def test_matches_sync_endpoints(self):
+        sync_client = APIClient()
+        pairs = [
+            ('/api/stocks/', '/api/async/stocks/'),
+            (f'/api/stocks/{self.stock.id}/', f'/api/async/stocks/{self.stock.id}/'),
+            (f'/api/stocks/{self.stock.id}/', '/api/async/quotes/S1/'),
+            (f'/api/portfolios/{self.portfolio.id}/positions/?include_lots=true',
+             f'/api/async/portfolios/{self.portfolio.id}/positions/?include_lots=true'),
+        ]
+        for sync_url, async_url in pairs:
+            with self.subTest(url=async_url):
+                expected = (await sync_to_async(sync_client.get)(sync_url)).content
+                response = await self.async_client.get(async_url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(json.loads(response.content), json.loads(expected))
+
+        response = await self.async_client.get('/api/async/news/', {'page_size': 2})
+        page = json.loads(response.content)
+        self.assertEqual([item['title'] for item in page['results']], ['News 2', 'News 1'])
+        self.assertIsNotNone(page['next'])
+        self.assertEqual((await self.async_client.get('/api/async/portfolios/0/positions/')).status_code, 404)
+
+
+class PerformanceMathTests(SimpleTestCase):
+    """Returns, volatility and drawdown of an equity curve"""
+
+    def curve(self, values, step=timedelta(days=1)):
+        start = datetime(2024, 1, 1, tzinfo=ZoneInfo('UTC'))
+        return [start + step * index for index in range(len(values))], np.array(values, dtype=float)
+
+    def test_summarize(self):
+        summary = performance.summarize(*self.curve([100, 110, 99, 121]))
+        self.assertEqual(summary['total_return'], 21.0)
+        self.assertEqual(summary['max_drawdown'], -10.0)
+        self.assertAlmostEqual(summary['volatility'], np.std([0.1, -0.1, 2 / 9]) * 100, places=3)
+
+    def test_summarize_needs_two_points(self):
+        self.assertEqual(performance.summarize(*self.curve([100])), {
+            'total_return': None, 'volatility': None, 'max_drawdown': None,
+        })
+
+    def test_period_returns(self):
+        returns = performance.period_returns(*self.curve([100 + index for index in range(10)]))
+        self.assertEqual(returns['1d'], round((109 / 108 - 1) * 100, 4))
+        self.assertEqual(returns['1w'], round((109 / 102 - 1) * 100, 4))
+        self.assertIsNone(returns['1m'])
+        self.assertEqual(performance.period_returns([], np.array([])), {name: None for name in performance.PERIODS})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PortfolioPerformanceTests(TestCase):
+    """Snapshots are captured in one statement and feed the performance endpoint"""
+
+    def setUp(self):
+        quote_cache.reset()
+        self.client = APIClient()
+        self.stock = Stock.objects.create(symbol='PERF', name='Perf', price=Decimal('10.00'), sector='Unknown')
+        self.portfolio = Portfolio.objects.create(cash_balance=Decimal('1000'))
+        self.portfolio.refresh_from_db()
+        self.portfolio.buy_stock(self.stock, 20, Decimal('10.00'))
+        self.empty = Portfolio.objects.create(cash_balance=Decimal('500'))
+
+    def test_capture_all(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(PortfolioSnapshot.capture_all(), 2)
+        self.assertEqual(
+            set(PortfolioSnapshot.objects.values_list('portfolio_id', 'cash_balance', 'stock_value')),
+            {(self.portfolio.id, Decimal('800.00'), Decimal('200.00')), (self.empty.id, Decimal('500.00'), Decimal('0.00'))},
+        )
+
+    def test_performance_endpoint(self):
+        now = timezone.now()
+        PortfolioSnapshot.objects.bulk_create([
+            PortfolioSnapshot(portfolio=self.portfolio, timestamp=now - timedelta(days=days),
+                              cash_balance=Decimal('800'), stock_value=Decimal(stock_value))
+            for days, stock_value in ((3, '200'), (2, '300'), (1, '100'), (0, '400'))
+        ])
+
+        response = self.client.get(f'/api/portfolios/{self.portfolio.id}/performance/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([point['value'] for point in response.data['equity_curve']], [1000, 1100, 900, 1200])
+        self.assertEqual(response.data['total_return'], 20.0)
+        self.assertEqual(response.data['max_drawdown'], round((900 / 1100 - 1) * 100, 4))
+        self.assertEqual(response.data['period_returns']['1d'], round((1200 / 900 - 1) * 100, 4))
+
+        start = (now - timedelta(days=1, hours=1)).isoformat()
+        response = self.client.get(f'/api/portfolios/{self.portfolio.id}/performance/', {'start': start})
+        self.assertEqual(len(response.data['equity_curve']), 2)
+        self.assertEqual(
+            self.client.get(f'/api/portfolios/{self.portfolio.id}/performance/', {'end': 'soon'}).status_code, 400
+        )
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PRICE_HISTORY_ROLLUP={'hour': {'days': 7}})
+class PriceHistoryTests(TestCase):
+    """Candles are bucketed in SQL and survive compaction of the ticks behind them"""
+
+    def setUp(self):
+        caches['quotes'].clear()
+        self.client = APIClient()
+        self.stock = Stock.objects.create(symbol='HIST', name='History', price=Decimal('10.00'), sector='Unknown')
+        self.hour = (timezone.now() - timedelta(days=30)).replace(minute=0, second=0, microsecond=0)
+        self.add_ticks(self.hour, [(0, '10.00'), (15, '12.00'), (30, '9.00'), (45, '11.00'), (50, '10.50')])
+        self.add_ticks(self.hour + timedelta(hours=1), [(5, '11.00')])
+
+    def add_ticks(self, hour, ticks):
+        PriceTick.objects.bulk_create([
+            PriceTick(stock=self.stock, timestamp=hour + timedelta(minutes=minute), price=Decimal(price))
+            for minute, price in ticks
+        ])
+
+    def candles(self):
+        return [
+            (candle['time'], candle['open'], candle['high'], candle['low'], candle['close'])
+            for candle in PriceTick.objects.filter(stock=self.stock).candles('hour')
+        ]
+
+    def test_candles(self):
+        self.assertEqual(self.candles(), [
+            (self.hour, Decimal('10.00'), Decimal('12.00'), Decimal('9.00'), Decimal('10.50')),
+            (self.hour + timedelta(hours=1), Decimal('11.00'), Decimal('11.00'), Decimal('11.00'), Decimal('11.00')),
+        ])
+
+    def test_compact_keeps_candles(self):
+        candles = self.candles()
+        self.assertEqual(PriceTick.objects.all().compact('hour'), 1)
+        self.assertFalse(PriceTick.objects.filter(timestamp=self.hour + timedelta(minutes=45)).exists())
+        self.assertEqual(self.candles(), candles)
+
+    def test_rollup_only_scans_past_its_last_cutoff(self):
+        self.assertEqual(rollup_price_ticks_task.apply().get(), {'hour': 1})
+        # A tick arriving late behind the cutoff is left alone rather than rescanning all history
+        self.add_ticks(self.hour, [(40, '10.20')])
+        self.assertEqual(rollup_price_ticks_task.apply().get(), {'hour': 0})
+        self.assertEqual(PriceTick.objects.count(), 6)
+
+    def test_history_endpoint(self):
+        url = '/api/stocks/HIST/history/'
+        params = {'interval': '1h', 'start': self.hour.isoformat(), 'end': (self.hour + timedelta(hours=2)).isoformat()}
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['symbol'], 'HIST')
+        self.assertEqual(
+            [(candle['open'], candle['close']) for candle in response.data['candles']],
+            [(Decimal('10.00'), Decimal('10.50')), (Decimal('11.00'), Decimal('11.00'))],
+        )
+
+        daily = self.client.get(url, {'interval': '1d', 'start': self.hour.isoformat()}).data['candles']
+        self.assertEqual(daily[0]['high'], Decimal('12.00'))
+        self.assertEqual(self.client.get(url, {'interval': '5m'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'start': 'yesterday'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/stocks/NOPE/history/').status_code, 404)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PriceIngestionTests(TestCase):
+    """apply_price_updates writes only real changes and counts every feed item"""
+
+    def setUp(self):
+        self.stocks = {
+            symbol: Stock.objects.create(symbol=symbol, name=symbol, price=Decimal(price), sector='Unknown')
+            for symbol, price in (('A', '10.00'), ('B', '20.00'), ('C', '30.00'))
+        }
+
+    @staticmethod
+    def quote(symbol, price):
+        return {'referentiel': {'ticker': symbol, 'stockName': symbol, 'last': price}}
+
+    def test_change_counts(self):
+        result = apply_price_updates([
+            self.quote('A', 10.004),
+            self.quote('B', 21),
+            self.quote('UNKNOWN', 5),
+            {'referentiel': {'stockName': 'No ticker', 'last': 1}},
+            self.quote('C', 'NaN'),
+            # The last quote for a symbol wins
+            self.quote('B', 22),
+        ])
+
+        self.assertEqual(
+            {key: result[key] for key in ('changed', 'unchanged', 'unknown', 'invalid')},
+            {'changed': 1, 'unchanged': 1, 'unknown': 1, 'invalid': 2},
+        )
+        self.assertEqual(result['stocks'], [self.stocks['B']])
+        self.assertEqual(result['previous'], {self.stocks['B'].id: Decimal('20.00')})
+        self.assertEqual(
+            dict(Stock.objects.values_list('symbol', 'price')),
+            {'A': Decimal('10.00'), 'B': Decimal('22.00'), 'C': Decimal('30.00')},
+        )
+        self.assertEqual(list(PriceTick.objects.values_list('stock__symbol', 'price')), [('B', Decimal('22.00'))])
+
+    def test_unchanged_feed_writes_nothing(self):
+        with self.assertNumQueries(1):
+            result = apply_price_updates([self.quote(symbol, stock.price) for symbol, stock in self.stocks.items()])
+        self.assertEqual((result['changed'], result['unchanged']), (0, 3))
+        self.assertFalse(PriceTick.objects.exists())
+
+    def test_query_count_does_not_grow_with_changes(self):
+        def count(prices):
+            with CaptureQueriesContext(connection) as context:
+                result = apply_price_updates([self.quote(symbol, price) for symbol, price in prices.items()])
+            self.assertEqual(result['changed'], len(prices))
+            return len(context)
+
+        self.assertEqual(count({'A': 11}), count({'A': 12, 'B': 22, 'C': 32}))
+
+
+class GatedBroker(InMemoryBroker):
+    """A broker whose subscriptions go live only when the test opens the gate, like Redis"""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = asyncio.Event()
+
+    async def _subscribed(self, channel):
+        await self.gate.wait()
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PRICE_STREAM={
+    'BACKEND': 'portfolio_app.pubsub.InMemoryBroker', 'COALESCE_INTERVAL': 0, 'KEEPALIVE': 5,
+})
+class PriceStreamTests(TestCase):
+    """Published price deltas reach stream subscribers, filtered and coalesced"""
+
+    def setUp(self):
+        quote_cache.reset()
+        for symbol in ('S1', 'S2'):
+            Stock.objects.create(symbol=symbol, name=symbol, price=Decimal('12.50'), sector='Unknown')
+        quote_cache.publish()
+
+    @staticmethod
+    def tick(prices):
+        result = apply_price_updates([
+            {'referentiel': {'ticker': symbol, 'stockName': symbol, 'last': price}}
+            for symbol, price in prices.items()
+        ])
+        publish_price_deltas(result, quote_cache.publish())
+
+    async def test_stream(self):
+        response = await self.async_client.get('/api/async/stocks/stream/', {'symbols': 'S1'})
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        try:
+            snapshot = (await anext(events)).decode()
+            self.assertIn('event: snapshot', snapshot)
+            self.assertIn('"S1": {"price": "12.50"}', snapshot)
+            self.assertNotIn('S2', snapshot)
+
+            # Both ticks land before the stream wakes up, so they arrive as one event
+            await sync_to_async(self.tick)({'S1': 11})
+            await sync_to_async(self.tick)({'S1': 12, 'S2': 13})
+            event = (await anext(events)).decode()
+            data = json.loads(event.split('data: ', 1)[1])
+            self.assertEqual(data['prices'], {'S1': {'price': '12.00', 'previous': '12.50'}})
+        finally:
+            await events.aclose()
+
+    @override_settings(PRICE_STREAM={'BACKEND': 'portfolio_app.tests.GatedBroker'})
+    async def test_snapshot_waits_for_subscription(self):
+        events = price_events(None, 0, 5)
+        snapshot = asyncio.ensure_future(anext(events))
+        try:
+            await asyncio.sleep(0.05)
+            self.assertFalse(snapshot.done())
+            get_broker().gate.set()
+            self.assertIn('event: snapshot', await snapshot)
+        finally:
+            snapshot.cancel()
+            await events.aclose()
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class TokenAuthTests(TestCase):
+    """Bearer tokens authenticate without queries and stop working after logout"""
+
+    def setUp(self):
+        quote_cache.reset()
+        revocations.reset()
+        self.client = APIClient()
+        portfolio = Portfolio.objects.create()
+        self.user = User.objects.create(username='trader', email='trader@example.com',
+                                        password='secret', language='fr', portfolio=portfolio)
+        self.tokens = generate_tokens(self.user)
+        quote_cache.publish()
+
+    def get_stocks(self, token):
+        return self.client.get('/api/stocks/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_authenticates_from_claims(self):
+        self.assertEqual(self.get_stocks(self.tokens['access']).status_code, 200)
+        with CaptureQueriesContext(connection) as context:
+            response = self.get_stocks(self.tokens['access'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(context), 0)
+        self.assertEqual(response.wsgi_request.user.portfolio_id, self.user.portfolio_id)
+
+    def test_rejects_bad_tokens(self):
+        self.assertEqual(self.get_stocks('not-a-token').status_code, 401)
+        self.assertEqual(self.get_stocks(self.tokens['refresh']).status_code, 401)
+
+    def test_logout_revokes_session(self):
+        self.assertEqual(self.get_stocks(self.tokens['access']).status_code, 200)
+        response = self.client.post('/api/auth/logout/', {'refresh': self.tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, 205)
+        self.assertEqual(self.get_stocks(self.tokens['access']).status_code, 401)
+        self.assertTrue(BlacklistedToken.objects.filter(token__token=self.tokens['refresh']).exists())
+
+        # Other processes only see the shared store
+        revocations.reset()
+        self.assertEqual(self.get_stocks(self.tokens['access']).status_code, 401)
+        self.assertEqual(self.get_stocks(generate_tokens(self.user)['access']).status_code, 200)
+
+
+@override_settings(DATABASE_ROUTING={'REPLICAS': ['replica'], 'PIN_SECONDS': 5})
+class ReplicaRoutingTests(SimpleTestCase):
+    """Safe requests read from replicas unless the client is pinned to the primary"""
+
+    def route(self, request):
+        """Run the middleware and report which alias a read and a write would use"""
+        seen = {}
+
+        def view(request):
+            seen['read'] = News.objects.all().db
+            seen['write'] = News.objects.select_for_update().db
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(view)(request)
+        return seen, response
+
+    def test_routing(self):
+        factory = RequestFactory()
+        seen, response = self.route(factory.get('/api/news/'))
+        self.assertEqual(seen, {'read': 'replica', 'write': 'default'})
+        self.assertNotIn('read_primary', response.cookies)
+
+        seen, response = self.route(factory.post('/api/portfolios/1/buy/'))
+        self.assertEqual(seen['read'], 'default')
+        self.assertEqual(response.cookies['read_primary']['max-age'], 5)
+
+        # Pinned after a write, or on request
+        pinned = factory.get('/api/news/')
+        pinned.COOKIES['read_primary'] = '1'
+        self.assertEqual(self.route(pinned)[0]['read'], 'default')
+        forced = factory.get('/api/news/', HTTP_X_READ_PRIMARY='true')
+        self.assertEqual(self.route(forced)[0]['read'], 'default')
+
+        # Outside requests (tasks, commands) always use the primary
+        self.assertEqual(News.objects.all().db, 'default')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BenchmarkTests(TestCase):
+    """The benchmark suite runs, leaves no trace, and flags regressions"""
+
+    def test_cases_run_and_roll_back(self):
+        data = BenchmarkData(users=3, stocks=5, max_holdings=3, max_lots=10, news=10)
+        self.addCleanup(data.cleanup)
+        lots = StockLot.objects.count()
+
+        results = run_suite(data, ['calculate_position', 'sell_stock_many_lots', 'positions_endpoint'], repeat=2)
+
+        self.assertEqual(set(results), {'calculate_position', 'sell_stock_many_lots', 'positions_endpoint'})
+        self.assertTrue(all(result['queries'] > 0 for result in results.values()))
+        self.assertEqual(StockLot.objects.count(), lots)
+        self.assertEqual(StockLot.objects.open().filter(stock=data.deep_stock, portfolio=data.deep_portfolio).count(),
+                         data.sizes['deepest_lots'])
+
+    def test_compare_flags_slower_and_chattier_cases(self):
+        baseline = {'a': {'median': 1.0, 'queries': 3}, 'b': {'median': 1.0, 'queries': 3}}
+        results = {'a': {'median': 1.1, 'queries': 3}, 'b': {'median': 1.5, 'queries': 4}, 'new': {'median': 9, 'queries': 9}}
+
+        self.assertEqual(compare(results, baseline, 0.2), [('b', 'median', 1.0, 1.5), ('b', 'queries', 3, 4)])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MetricsTests(TestCase):
+    """Requests and tasks report their SQL and serializer cost"""
+
+    def setUp(self):
+        quote_cache.reset()
+        metrics.reset()
+        self.client = APIClient()
+        self.stock = Stock.objects.create(symbol='S1', name='Stock 1', price=Decimal('10.00'), sector='Unknown')
+        self.portfolio = Portfolio.objects.create(cash_balance=Decimal('10000'))
+        self.portfolio.refresh_from_db()
+        self.portfolio.buy_stock(self.stock, 5, Decimal('10.00'))
+        quote_cache.publish()
+
+    def test_server_timing_and_histograms(self):
+        response = self.client.get(f'/api/portfolios/{self.portfolio.id}/')
+        self.assertEqual(response.status_code, 200)
+        queries = int(re.search(r'db;dur=[\d.]+;desc="(\d+) queries"', response['Server-Timing']).group(1))
+        self.assertGreater(queries, 0)
+        self.assertNotIn('serialize;dur=0.0', response['Server-Timing'])
+
+        revalue_portfolios_task.apply()
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('http_request_duration_seconds_count{view="portfolio-detail",method="GET",status="200"} 1', body)
+        self.assertIn(f'http_request_queries_sum{{view="portfolio-detail",method="GET",status="200"}} {float(queries)}', body)
+        self.assertIn('celery_task_queries_count{task="portfolio_app.task.revalue_portfolios_task",state="SUCCESS"} 1', body)
+
+    async def test_async_views_count_queries(self):
+        response = await self.async_client.get(f'/api/async/portfolios/{self.portfolio.id}/positions/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('desc="0 queries"', response['Server-Timing'])
+
+    @override_settings(METRICS={'CACHE_ALIAS': 'missing'})
+    def test_flush_failure_does_not_fail_the_request(self):
+        with self.assertLogs('portfolio_app.metrics', 'WARNING'):
+            response = self.client.get(f'/api/portfolios/{self.portfolio.id}/')
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(METRICS={'CACHE_ALIAS': 'quotes', 'TOKEN': 'secret'})
+    def test_token(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class ProfilingTests(TestCase):
+    """Staff can profile a live request and fetch the flame graph input"""
+
+    def setUp(self):
+        quote_cache.reset()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings = override_settings(PROFILING={'DIRECTORY': directory, 'INTERVAL': 0.0002, 'MAX_BYTES': 10 ** 6})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+        self.portfolio = Portfolio.objects.create(cash_balance=Decimal('10000'))
+        self.staff = get_user_model().objects.create_user('staff', password='secret', is_staff=True)
+        self.client = APIClient()
+
+    def test_staff_header(self):
+        url = f'/api/portfolios/{self.portfolio.id}/'
+        self.assertNotIn('X-Profile-Id', self.client.get(url, HTTP_X_PROFILE='1'))
+        self.assertEqual(self.client.get('/api/profiles/').status_code, 302)
+
+        self.client.force_login(self.staff)
+        # A request can finish before the sampler first gets the GIL
+        for _ in range(20):
+            response = self.client.get(url, HTTP_X_PROFILE='1')
+            if 'X-Profile-Id' in response:
+                break
+        name = response['X-Profile-Id']
+        self.assertEqual([profile['name'] for profile in self.client.get('/api/profiles/').json()['profiles']], [name])
+        self.assertEqual(self.client.get('/api/profiles/../settings.py/').status_code, 404)
+
+        body = b''.join(self.client.get(f'/api/profiles/{name}/').streaming_content).decode()
+        stack, count = body.splitlines()[0].rsplit(' ', 1)
+        self.assertIn('get_response', stack)
+        self.assertGreater(int(count), 0)
+
+    def test_disk_limit(self):
+        def busy_profile():
+            sampler = profiling.Sampler().start()
+            deadline = time.perf_counter() + 0.01
+            while time.perf_counter() < deadline:
+                pass
+            sampler.stop()
+            return profiling.save('task', 'busy', sampler)
+
+        names = [busy_profile() for _ in range(3)]
+        sizes = sum(profile['size'] for profile in profiling.list_profiles()[:2])
+        with override_settings(PROFILING={**profiling.profiling_config(), 'MAX_BYTES': sizes}):
+            profiling.enforce_limit()
+        self.assertEqual([profile['name'] for profile in profiling.list_profiles()], names[:0:-1])
+
+
+ALWAYS_OPEN = {
+    'CACHE_ALIAS': 'quotes', 'TRADING_DAYS': list(range(7)), 'SESSION': ('00:00', '23:59:59.999999'),
+    'BACKOFF_BASE': 30, 'BACKOFF_MAX': 900,
+}
+
+
+@override_settings(CACHES=LOCMEM_CACHES, PRICE_POLLING=ALWAYS_OPEN, PRICE_STREAM={'BACKEND': 'portfolio_app.pubsub.InMemoryBroker'})
+class PricePollingTests(TestCase):
+    """Scheduled polls are single-flight, conditional, backed off and follow trading hours"""
+
+    def setUp(self):
+        quote_cache.reset()
+        caches['quotes'].clear()
+        # revalue_portfolios_task runs inline instead of going to the broker
+        celery = {key: celery_app.conf[key] for key in ('task_always_eager', 'broker_write_url')}
+        celery_app.conf.update(task_always_eager=True, broker_write_url='memory://')
+        self.addCleanup(celery_app.conf.update, celery)
+        Stock.objects.create(symbol='S1', name='Stock 1', price=Decimal('10.00'), sector='Unknown')
+        file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        with file:
+            json.dump([{'referentiel': {'ticker': 'S1', 'stockName': 'Stock 1', 'last': 11}}], file)
+        self.addCleanup(os.unlink, file.name)
+        self.feed = {'BACKEND': 'portfolio_app.feeds.JsonFileFeed', 'OPTIONS': {'path': file.name}}
+
+    def test_trading_hours(self):
+        tunis = ZoneInfo('Africa/Tunis')
+        with override_settings(PRICE_POLLING={'HOLIDAYS': ['2024-01-02']}):
+            self.assertTrue(market.in_session(datetime(2024, 1, 1, 10, 0, tzinfo=tunis)))
+            self.assertFalse(market.in_session(datetime(2024, 1, 1, 15, 0, tzinfo=tunis)))
+            self.assertFalse(market.in_session(datetime(2024, 1, 6, 10, 0, tzinfo=tunis)))
+            self.assertFalse(market.in_session(datetime(2024, 1, 2, 10, 0, tzinfo=tunis)))
+            self.assertEqual(market.poll_interval(datetime(2024, 1, 6, 10, 0, tzinfo=tunis)), 3600)
+
+    def test_unchanged_feed_and_overlap(self):
+        with override_settings(STOCK_FEED=self.feed):
+            self.assertEqual(update_stock_prices_task(scheduled=True)['changed'], 1)
+            self.assertEqual(update_stock_prices_task(scheduled=True), {'unchanged': True})
+
+            caches['quotes'].add(POLL_LOCK_KEY, 'other worker', 60)
+            self.assertEqual(update_stock_prices_task(scheduled=True), {'skipped': 'already running'})
+
+    def test_idle_outside_session(self):
+        with override_settings(STOCK_FEED=self.feed, PRICE_POLLING={**ALWAYS_OPEN, 'TRADING_DAYS': []}):
+            self.assertEqual(update_stock_prices_task(scheduled=True)['changed'], 1)
+            self.assertEqual(update_stock_prices_task(scheduled=True), {'skipped': 'outside trading hours'})
+
+    def test_backoff(self):
+        down = {'BACKEND': 'portfolio_app.feeds.HttpFeed', 'OPTIONS': {'url': 'http://127.0.0.1:9/', 'timeout': 1}}
+        with override_settings(STOCK_FEED=down):
+            with self.assertRaises(requests.RequestException):
+                update_stock_prices_task(scheduled=True)
+            self.assertEqual(update_stock_prices_task(scheduled=True), {'skipped': 'backing off'})
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class SyncStocksTests(TestCase):
+    """sync_stocks upserts the universe in one statement"""
+
+    def test_upsert_and_delist(self):
+        Stock.objects.create(symbol='OLD', name='Old name', price=Decimal('1.00'), sector='Banks')
+        Stock.objects.create(symbol='GONE', name='Gone', price=Decimal('2.00'), sector='Unknown')
+        feed = [
+            {'referentiel': {'ticker': 'OLD', 'stockName': 'New name', 'last': 1.5}},
+            {'referentiel': {'ticker': 'NEW', 'stockName': 'New stock'}, 'last': 3},
+            {'referentiel': {'stockName': 'No ticker'}},
+        ]
+        file = tempfile.NamedTemporaryFile('w', suffix='.json', delete=False)
+        with file:
+            json.dump(feed, file)
+        self.addCleanup(os.unlink, file.name)
+
+        with CaptureQueriesContext(connection) as context, mock.patch('portfolio_app.task.get_broker') as broker:
+            call_command('sync_stocks', '--source', file.name, '--mark-delisted', stdout=io.StringIO())
+        self.assertEqual(sum('INSERT INTO "portfolio_app_stock"' in query['sql'] for query in context), 1)
+
+        # The price change is recorded and streamed like any polled one
+        self.assertEqual(list(PriceTick.objects.values_list('stock__symbol', 'price')), [('OLD', Decimal('1.50'))])
+        channel, message = broker.return_value.publish.call_args.args
+        self.assertEqual(message['prices'], {'OLD': {'price': '1.50', 'previous': '1.00'}})
+
+        stocks = {stock.symbol: stock for stock in Stock.objects.all()}
+        self.assertEqual((stocks['OLD'].name, stocks['OLD'].price, stocks['OLD'].sector),
+                         ('New name', Decimal('1.50'), 'Banks'))
+        self.assertEqual(stocks['NEW'].price, Decimal('3.00'))
+        self.assertFalse(stocks['GONE'].listed)
+        self.assertTrue(stocks['NEW'].listed)
+
+        client = APIClient()
+        self.assertEqual([quote['symbol'] for quote in client.get('/api/stocks/', {'listed': 'false'}).data], ['GONE'])
+        self.assertEqual(
+            sorted(quote['symbol'] for quote in client.get('/api/stocks/', {'listed': 'true'}).data), ['NEW', 'OLD']
+        )
+        self.assertEqual(client.get('/api/stocks/', {'listed': 'maybe'}).status_code, 400)
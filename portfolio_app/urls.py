@@ -3,6 +3,7 @@ from rest_framework.routers import DefaultRouter
 from rest_framework_simplejwt.views import TokenRefreshView
 
 # Import the views
+from . import async_views
 from .views import (
     UserViewSet,
     PortfolioViewSet,
@@ -12,7 +13,9 @@ from .views import (
     CustomTokenObtainPairView,
     RegisterView,
     LogoutView,
-    LoginView
+    LoginView,
+    profile_download,
+    profile_list,
 )
 
 # Initialize router
@@ -31,6 +34,17 @@ urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='auth_register'),
     path('auth/login/', LoginView.as_view(), name='auth_login'),
 
+    # Async read paths, for deployments behind the ASGI application
+    path('async/stocks/', async_views.stock_list, name='async_stock_list'),
+    path('async/stocks/stream/', async_views.price_stream, name='async_price_stream'),
+    path('async/stocks/<int:pk>/', async_views.stock_detail, name='async_stock_detail'),
+    path('async/quotes/<str:symbol>/', async_views.quote_detail, name='async_quote_detail'),
+    path('async/portfolios/<int:pk>/positions/', async_views.portfolio_positions, name='async_portfolio_positions'),
+    path('async/news/', async_views.news_list, name='async_news_list'),
+
+    # Sampling profiles of live requests and tasks (staff only)
+    path('profiles/', profile_list, name='profile_list'),
+    path('profiles/<str:name>/', profile_download, name='profile_download'),
 
     path('', include(router.urls)),
 ]
\ No newline at end of file
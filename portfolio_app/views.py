@@ -7,7 +7,8 @@ from .serializers import NewsSerializer
 import jwt
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone as dt_timezone
+import uuid
 from django.conf import settings
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
@@ -16,9 +17,22 @@ from rest_framework import generics
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework_simplejwt.views import TokenObtainPairView
 from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
 from django.contrib.auth import get_user_model
+from django.db.models import Count, Prefetch
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.views.decorators.http import require_GET
+import hmac
 
-from .models import User, Portfolio, Stock, StockLot, Transaction
+from . import metrics, performance, profiling
+from .authentication import revocations
+from .conditional import conditional
+from .pagination import DateKeysetPagination, IdKeysetPagination, RankKeysetPagination
+from .quotes import quote_cache
+from .models import User, Portfolio, PortfolioSnapshot, Position, PriceTick, Stock, StockLot, Transaction
 from .serializers import (
     UserSerializer, 
     PortfolioSerializer, 
@@ -29,21 +43,120 @@ from .serializers import (
     StockLotSerializer,
     LoginSerializer
 )
+def holdings_prefetches(prefix=''):
+    """Prefetches matching PortfolioSerializer's stock_lots and positions fields.
+
+    Stock details come from the quote cache, so the Stock table is not joined.
+    """
+    return [
+        Prefetch(f'{prefix}stock_lots', queryset=StockLot.objects.all()),
+        Prefetch(f'{prefix}positions', queryset=Position.objects.open()),
+    ]
+
+def quotes_validators(view, request, *args, **kwargs):
+    """Quotes only change when the price task publishes a new cache version"""
+    return f'quotes-{quote_cache.version}', None
+
+def news_validators(view, request, *args, **kwargs):
+    """Every insert, edit and delete moves the News change marker"""
+    changed = News.last_changed()
+    return f"news-{changed.timestamp()}", changed
+
+def portfolio_validators(view, request, pk=None, **kwargs):
+    """Trades bump Portfolio.last_updated; position values also move with quotes.
+
+    ETag only: last_updated alone would answer If-Modified-Since with a 304
+    after a new quote version revalued the positions.
+    """
+    try:
+        last_updated = Portfolio.objects.filter(pk=pk).values_list('last_updated', flat=True).first()
+    except ValueError:
+        last_updated = None
+    if last_updated is None:
+        # Let the view answer 404
+        return None, None
+    return f'portfolio-{pk}-{last_updated.timestamp()}-{quote_cache.version}', None
+
+def positions_response(portfolio, positions):
+    """Body of the positions endpoint, shared with its async counterpart"""
+    stock_value = sum((position['current_value'] for position in positions), Decimal(0))
+    total_cost = sum((position['total_cost'] for position in positions), Decimal(0))
+    
+    return {
+        'positions': positions,
+        'portfolio_summary': {
+            'cash_balance': portfolio.cash_balance,
+            'stock_value': stock_value,
+            'total_value': portfolio.cash_balance + stock_value,
+            'total_cost': total_cost,
+            'total_gain': (portfolio.cash_balance + stock_value) - (10000 + total_cost),
+            'return_percentage': 
+                (((portfolio.cash_balance + stock_value) - 10000) / 10000 * 100)
+        }
+    }
+
+def filter_news(query_params, search=True):
+    """News filtered by start_date/end_date and, if ``search``, ranked by ?q="""
+    queryset = News.objects.all()
+    
+    # Example of date filtering
+    start_date = query_params.get('start_date', None)
+    end_date = query_params.get('end_date', None)
+    
+    if start_date is not None:
+        queryset = queryset.filter(date__gte=start_date)
+    if end_date is not None:
+        queryset = queryset.filter(date__lte=end_date)
+
+    text = query_params.get('q', '').strip()
+    if search and text:
+        return queryset.search(text).order_by('-rank', '-date', '-id')
+    
+    return queryset.order_by('-date')
+
+def filter_stocks(quotes, query_params):
+    """Quotes filtered by ?listed=true|false; raises ValueError on any other value"""
+    listed = query_params.get('listed')
+    if listed is None:
+        return quotes
+    if listed not in ('true', 'false'):
+        raise ValueError("listed must be 'true' or 'false'")
+    return [quote for quote in quotes if quote['listed'] == (listed == 'true')]
+
+def news_paginator(query_params):
+    # Search results page by relevance, everything else by date
+    if query_params.get('q', '').strip():
+        return RankKeysetPagination()
+    return DateKeysetPagination()
+
 class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 def generate_tokens(user):
     """Generate access and refresh tokens manually"""
-    # Access token - expires in 1 hour
+    now = datetime.utcnow()
+    # Shared by both tokens so logging out revokes the pair
+    session_id = uuid.uuid4().hex
+
+    # Access token - expires in 1 hour. Carries the claims CachedJWTAuthentication
+    # needs, so authenticating a request does not load the user.
     access_payload = {
         'user_id': user.id,
-        'exp': datetime.utcnow() + timedelta(hours=1),
+        'username': user.username,
+        'portfolio_id': user.portfolio_id,
+        'sid': session_id,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + timedelta(hours=1),
         'type': 'access'
     }
     
     # Refresh token - expires in 1 day
     refresh_payload = {
         'user_id': user.id,
-        'exp': datetime.utcnow() + timedelta(days=1),
+        'sid': session_id,
+        'jti': uuid.uuid4().hex,
+        'iat': now,
+        'exp': now + timedelta(days=1),
         'type': 'refresh'
     }
     
@@ -131,61 +244,161 @@ class LogoutView(generics.GenericAPIView):
         try:
             refresh_token = request.data["refresh"]
             decoded_payload = jwt.decode(refresh_token, settings.SECRET_KEY, algorithms=['HS256'])
-            #user_id = decoded_payload['user_id']
-
-            # Implement blacklist logic to store user_id as blacklisted
-            # (e.g., database model or cache)
-
-            return Response(status=status.HTTP_205_RESET_CONTENT)
+            if decoded_payload.get('type') != 'refresh':
+                raise ValueError('Not a refresh token')
         except Exception:
             return Response(
                 {'error': 'Invalid or missing refresh token'},
                 status=status.HTTP_400_BAD_REQUEST
             )
+
+        # Revoke the whole session, so the paired access token stops working too
+        if 'sid' in decoded_payload:
+            revocations.revoke(decoded_payload['sid'], decoded_payload['exp'])
+        if 'jti' in decoded_payload:
+            # Durable record in simplejwt's blacklist tables, visible in the admin
+            outstanding, _ = OutstandingToken.objects.get_or_create(
+                jti=decoded_payload['jti'],
+                defaults={
+                    'token': refresh_token,
+                    'created_at': datetime.fromtimestamp(decoded_payload.get('iat', 0), tz=dt_timezone.utc),
+                    'expires_at': datetime.fromtimestamp(decoded_payload['exp'], tz=dt_timezone.utc),
+                }
+            )
+            BlacklistedToken.objects.get_or_create(token=outstanding)
+
+        return Response(status=status.HTTP_205_RESET_CONTENT)
 class StockViewSet(viewsets.ModelViewSet):
     queryset = Stock.objects.all()
     serializer_class = StockSerializer
 
+    @swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter('listed', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=['true', 'false'],
+                              description='Only stocks still (true) or no longer (false) in the market data feed'),
+        ],
+        responses={400: 'Bad Request - invalid listed filter'}
+    )
+    @conditional(quotes_validators)
+    def list(self, request, *args, **kwargs):
+        """Served from the quote cache, without touching the Stock table"""
+        try:
+            return Response(filter_stocks(quote_cache.all(), request.query_params))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    @conditional(quotes_validators)
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            quote = quote_cache.get(int(kwargs['pk']))
+        except ValueError:
+            quote = None
+        if quote is None:
+            return super().retrieve(request, *args, **kwargs)
+        return Response(quote)
+
+    HISTORY_INTERVALS = {
+        '1m': ('minute', timedelta(minutes=1)),
+        '1h': ('hour', timedelta(hours=1)),
+        '1d': ('day', timedelta(days=1)),
+        '1w': ('week', timedelta(weeks=1)),
+    }
+    MAX_CANDLES = 1000
+
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('interval', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              enum=['1m', '1h', '1d', '1w'], description='Candle size (default 1h)'),
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              format=openapi.FORMAT_DATETIME, description='Start of the range (ISO 8601)'),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              format=openapi.FORMAT_DATETIME, description='End of the range (ISO 8601, default now)'),
+        ],
+        responses={400: 'Bad Request - invalid interval or date', 404: 'Stock not found'}
+    )
+    @action(detail=False, methods=['get'], url_path=r'(?P<symbol>[^/.]+)/history')
+    def history(self, request, symbol=None):
+        """OHLC candles for a stock, bucketed in the database"""
+        interval = request.query_params.get('interval', '1h')
+        if interval not in self.HISTORY_INTERVALS:
+            return Response(
+                {'error': f"interval must be one of {', '.join(self.HISTORY_INTERVALS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        unit, step = self.HISTORY_INTERVALS[interval]
+
+        try:
+            end = self._parse_datetime(request.query_params.get('end')) or timezone.now()
+            start = self._parse_datetime(request.query_params.get('start'))
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        # Never scan more than MAX_CANDLES buckets
+        earliest = end - step * self.MAX_CANDLES
+        start = max(start, earliest) if start else earliest
+
+        try:
+            stock = Stock.objects.get(symbol=symbol)
+        except Stock.DoesNotExist:
+            return Response({'error': 'Stock not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        candles = PriceTick.objects.filter(
+            stock=stock,
+            timestamp__gte=start,
+            timestamp__lte=end
+        ).candles(unit)
+        return Response({
+            'symbol': stock.symbol,
+            'interval': interval,
+            'start': start,
+            'end': end,
+            'candles': list(candles)
+        })
+
+    @staticmethod
+    def _parse_datetime(value):
+        if not value:
+            return None
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f'Invalid datetime: {value}')
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        return parsed
+
 class PortfolioViewSet(viewsets.ModelViewSet):
     queryset = Portfolio.objects.all()
     serializer_class = PortfolioSerializer
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'positions':
+            return queryset.prefetch_related(
+                Prefetch('positions', queryset=Position.objects.open())
+            )
+        if self.action in ('list', 'retrieve', 'update', 'partial_update'):
+            return queryset.prefetch_related(*holdings_prefetches())
+        # Trading actions mutate holdings, so they must not work off a prefetch cache
+        return queryset
+
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter(
+                'include_lots', openapi.IN_QUERY,
+                description='Include per-lot detail for every position',
+                type=openapi.TYPE_BOOLEAN
+            )
+        ]
+    )
     @action(detail=True, methods=['get'])
+    @conditional(portfolio_validators)
     def positions(self, request, pk=None):
         """Get all positions in the portfolio with their current returns"""
         portfolio = self.get_object()
-        stocks = Stock.objects.filter(
-            stocklot__portfolio=portfolio,
-            stocklot__remaining_quantity__gt=0
-        ).distinct()
-        
-        positions = []
-        stock_value = Decimal(0)
-        total_cost = Decimal(0)
-        
-        for stock in stocks:
-            position = portfolio.calculate_position(stock)
-            positions.append({
-                'symbol': stock.symbol,
-                'name': stock.name,
-                'current_price': stock.price,
-                **position
-            })
-            stock_value += position['current_value']
-            total_cost += position['total_cost']
-        
-        return Response({
-            'positions': positions,
-            'portfolio_summary': {
-                'cash_balance': portfolio.cash_balance,
-                'stock_value': stock_value,
-                'total_value': portfolio.cash_balance + stock_value,
-                'total_cost': total_cost,
-                'total_gain': (portfolio.cash_balance + stock_value) - (10000 + total_cost),
-                'return_percentage': 
-                    (((portfolio.cash_balance + stock_value) - 10000) / 10000 * 100)
-            }
-        })
+        include_lots = request.query_params.get('include_lots', '').lower() in ('1', 'true')
+        positions = portfolio.get_positions(include_lots=include_lots)
+        return Response(positions_response(portfolio, positions))
     @swagger_auto_schema(
         method='post',
         request_body=openapi.Schema(
@@ -328,24 +541,189 @@ class PortfolioViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @swagger_auto_schema(
+        method='get',
+        manual_parameters=[
+            openapi.Parameter('start', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              format=openapi.FORMAT_DATETIME, description='Start of the range (ISO 8601, default one year ago)'),
+            openapi.Parameter('end', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                              format=openapi.FORMAT_DATETIME, description='End of the range (ISO 8601, default now)'),
+        ],
+        responses={400: 'Bad Request - invalid date'}
+    )
+    @action(detail=True, methods=['get'])
+    def performance(self, request, pk=None):
+        """Equity curve and period returns from the portfolio's value snapshots"""
+        portfolio = self.get_object()
+        try:
+            end = StockViewSet._parse_datetime(request.query_params.get('end')) or timezone.now()
+            start = StockViewSet._parse_datetime(request.query_params.get('start')) or end - timedelta(days=365)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        snapshots = PortfolioSnapshot.objects.filter(
+            portfolio=portfolio,
+            timestamp__gte=start,
+            timestamp__lte=end
+        ).order_by('timestamp').values_list('timestamp', 'cash_balance', 'stock_value')
+        timestamps, values = performance.equity_curve(snapshots)
+
+        return Response({
+            'start': start,
+            'end': end,
+            'equity_curve': [
+                {'timestamp': timestamp, 'value': round(value, 2)}
+                for timestamp, value in zip(timestamps, values.tolist())
+            ],
+            'period_returns': performance.period_returns(timestamps, values),
+            **performance.summarize(timestamps, values)
+        })
+
+    MAX_BATCH_ORDERS = 100
+
+    @swagger_auto_schema(
+        method='post',
+        request_body=openapi.Schema(
+            type=openapi.TYPE_OBJECT,
+            required=['orders'],
+            properties={
+                'orders': openapi.Schema(
+                    type=openapi.TYPE_ARRAY,
+                    items=openapi.Schema(
+                        type=openapi.TYPE_OBJECT,
+                        required=['side', 'symbol', 'quantity', 'price'],
+                        properties={
+                            'side': openapi.Schema(type=openapi.TYPE_STRING, enum=['buy', 'sell']),
+                            'symbol': openapi.Schema(type=openapi.TYPE_STRING, description='Stock symbol'),
+                            'quantity': openapi.Schema(type=openapi.TYPE_INTEGER, description='Number of shares'),
+                            'price': openapi.Schema(type=openapi.TYPE_NUMBER, description='Price per share')
+                        }
+                    )
+                )
+            }
+        ),
+        responses={
+            200: openapi.Response(
+                description="Per-order results; failed orders do not roll back the others",
+                schema=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    properties={
+                        'results': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                        'filled': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'failed': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'cash_balance': openapi.Schema(type=openapi.TYPE_NUMBER),
+                        'total_value': openapi.Schema(type=openapi.TYPE_NUMBER)
+                    }
+                )
+            ),
+            400: 'Bad Request - missing or oversized order list'
+        }
+    )
+    @action(detail=True, methods=['post'])
+    def orders(self, request, pk=None):
+        """Execute a batch of buy/sell orders in one database transaction"""
+        orders = request.data.get('orders')
+        if not isinstance(orders, list) or not orders:
+            return Response(
+                {'error': 'orders must be a non-empty list'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(orders) > self.MAX_BATCH_ORDERS:
+            return Response(
+                {'error': f'At most {self.MAX_BATCH_ORDERS} orders per batch'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        symbols = {
+            order.get('symbol') for order in orders
+            if isinstance(order, dict) and isinstance(order.get('symbol'), str)
+        }
+        stocks = Stock.objects.in_bulk(symbols, field_name='symbol')
+
+        results = []
+        valid = []
+        for index, order in enumerate(orders):
+            result = {'index': index}
+            results.append(result)
+            try:
+                if not isinstance(order, dict):
+                    raise ValueError('Each order must be an object')
+                side = str(order['side']).lower()
+                symbol = order['symbol']
+                quantity = int(order['quantity'])
+                price = Decimal(str(order['price']))
+                result.update({'side': side, 'symbol': symbol})
+
+                if side not in ('buy', 'sell'):
+                    raise ValueError("side must be 'buy' or 'sell'")
+                if quantity <= 0:
+                    raise ValueError("Quantity must be positive")
+                if not price.is_finite() or price <= 0:
+                    raise ValueError("Price must be a positive number")
+                stock = stocks.get(symbol)
+                if stock is None:
+                    raise ValueError('Stock not found')
+                valid.append((result, (side, stock, quantity, price)))
+            except (KeyError, TypeError, ValueError, ArithmeticError) as e:
+                result['status'] = 'failed'
+                result['error'] = f'Missing field: {e}' if isinstance(e, KeyError) else str(e)
+
+        portfolio = self.get_object()
+        # execute_orders locks the portfolio and checks cash and shares in
+        # memory, so the query count does not grow with the batch
+        outcomes = portfolio.execute_orders([order for _, order in valid])
+
+        for (result, (side, _, _, _)), outcome in zip(valid, outcomes):
+            if 'error' in outcome:
+                result['status'] = 'failed'
+                result['error'] = outcome['error']
+                continue
+            result['status'] = 'filled'
+            if side == 'buy':
+                result['transaction'] = TransactionSerializer(outcome['transactions'][0]).data
+            else:
+                result['realized_gain'] = outcome['realized_gain']
+                result['transactions'] = TransactionSerializer(outcome['transactions'], many=True).data
+
+        filled = sum(1 for result in results if result['status'] == 'filled')
+        return Response({
+            'results': results,
+            'filled': filled,
+            'failed': len(results) - filled,
+            'cash_balance': portfolio.cash_balance,
+            'total_value': portfolio.totalValue
+        })
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    pagination_class = IdKeysetPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'transaction_history':
+            return queryset
+        return queryset.select_related('portfolio').prefetch_related(
+            *holdings_prefetches('portfolio__')
+        ).annotate(transaction_count=Count('transactions'))
 
     @action(detail=True, methods=['get'])
     def transaction_history(self, request, pk=None):
         """Get user's transaction history"""
         user = self.get_object()
-        transactions = Transaction.objects.filter(user=user).order_by('-date')
-        return Response(TransactionSerializer(transactions, many=True).data)
+        transactions = Transaction.objects.filter(user=user).select_related('lot')
+        paginator = DateKeysetPagination()
+        page = paginator.paginate_queryset(transactions, request, view=self)
+        return paginator.get_paginated_response(TransactionSerializer(page, many=True).data)
 
 class TransactionViewSet(viewsets.ModelViewSet):
     queryset = Transaction.objects.all()
     serializer_class = TransactionSerializer
+    pagination_class = DateKeysetPagination
     
     def get_queryset(self):
         """Filter transactions by user if specified"""
-        queryset = Transaction.objects.all()
+        queryset = Transaction.objects.select_related('lot')
         user_id = self.request.query_params.get('user_id', None)
         if user_id is not None:
             queryset = queryset.filter(user_id=user_id)
@@ -354,21 +732,27 @@ class TransactionViewSet(viewsets.ModelViewSet):
 class NewsViewSet(viewsets.ModelViewSet):
     queryset = News.objects.all()
     serializer_class = NewsSerializer
+    pagination_class = DateKeysetPagination
     
+    @property
+    def paginator(self):
+        if not hasattr(self, '_paginator'):
+            self._paginator = news_paginator(self.request.query_params)
+        return self._paginator
+
+    @swagger_auto_schema(manual_parameters=[
+        openapi.Parameter('q', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description='Full-text search over title and description, best match first'),
+        openapi.Parameter('start_date', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date'),
+        openapi.Parameter('end_date', openapi.IN_QUERY, type=openapi.TYPE_STRING, format='date'),
+    ])
+    @conditional(news_validators)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     def get_queryset(self):
         """Optionally restricts the returned news by filtering"""
-        queryset = News.objects.all()
-        
-        # Example of date filtering
-        start_date = self.request.query_params.get('start_date', None)
-        end_date = self.request.query_params.get('end_date', None)
-        
-        if start_date is not None:
-            queryset = queryset.filter(date__gte=start_date)
-        if end_date is not None:
-            queryset = queryset.filter(date__lte=end_date)
-        
-        return queryset.order_by('-date')
+        return filter_news(self.request.query_params, search=self.action == 'list')
     
     @action(detail=False, methods=['delete'])
     def delete_all(self, request):
@@ -378,4 +762,30 @@ class NewsViewSet(viewsets.ModelViewSet):
         return Response({
             'message': f'Successfully deleted {count} news records',
             'deleted_count': count
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        }, status=status.HTTP_200_OK)
+
+
+@require_GET
+def metrics_view(request):
+    """Prometheus scrape endpoint: request and Celery task histograms of every process"""
+    token = metrics.metrics_config().get('TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@staff_member_required
+@require_GET
+def profile_list(request):
+    """Recently captured request and task profiles, newest first"""
+    return JsonResponse({'profiles': profiling.list_profiles()})
+
+
+@staff_member_required
+@require_GET
+def profile_download(request, name):
+    """One profile in collapsed-stack format, for flamegraph.pl or speedscope"""
+    path = profiling.profile_path(name)
+    if path is None:
+        raise Http404('Profile not found')
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=name, content_type='text/plain')
@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 from pathlib import Path
 from datetime import timedelta
 
+from celery.schedules import crontab
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -49,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'portfolio_app.middleware.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -57,6 +60,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'portfolio_app.middleware.ProfilingMiddleware',
+    'portfolio_app.middleware.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'stock_portfolio_project.urls'
@@ -91,7 +96,17 @@ DATABASES = {
         'PASSWORD': 'higgs',  # your PostgreSQL password
         'HOST': 'localhost',
         'PORT': '5432',
-    }
+    },
+    # Read replicas are extra aliases listed in DATABASE_ROUTING['REPLICAS'], e.g.
+    # 'replica': {..., 'HOST': 'replica-host', 'TEST': {'MIRROR': 'default'}},
+}
+
+# Safe requests read from a random replica; a client that just wrote is pinned to
+# the primary for PIN_SECONDS (portfolio_app.routers, portfolio_app.middleware).
+DATABASE_ROUTERS = ['portfolio_app.routers.ReplicaRouter']
+DATABASE_ROUTING = {
+    'REPLICAS': [],
+    'PIN_SECONDS': 5,
 }
 # CORS settings
 CORS_ALLOW_ALL_ORIGINS = True  # Only for development! Configure properly for production
@@ -99,7 +114,7 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'portfolio_app.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',  # Changed from IsAuthenticated to AllowAny
@@ -155,4 +170,136 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 CELERY_BROKER_URL = 'redis://localhost:6379/0'
 CELERY_ACCEPT_CONTENT = ['json']
-CELERY_TASK_SERIALIZER = 'json'
\ No newline at end of file
+CELERY_TASK_SERIALIZER = 'json'
+
+# Price polling cadence (portfolio_app.market, update_stock_prices_task). Beat
+# enqueues a poll every SESSION_INTERVAL seconds; outside the BVMT session
+# (TIMEZONE, TRADING_DAYS, SESSION open/close incl. the closing auction, HOLIDAYS
+# as ISO dates) polls reach the feed only every IDLE_INTERVAL seconds. Upstream
+# failures back off from BACKOFF_BASE doubling up to BACKOFF_MAX seconds, and a
+# lock in CACHE_ALIAS (shared by every worker) keeps runs from overlapping.
+PRICE_POLLING = {
+    'CACHE_ALIAS': 'quotes',
+    'TIMEZONE': 'Africa/Tunis',
+    'TRADING_DAYS': [0, 1, 2, 3, 4],
+    'SESSION': ('09:00', '14:30'),
+    'HOLIDAYS': [],
+    'SESSION_INTERVAL': 30,
+    'IDLE_INTERVAL': 60 * 60,
+    'BACKOFF_BASE': 30,
+    'BACKOFF_MAX': 15 * 60,
+    'LOCK_TIMEOUT': 5 * 60,
+}
+
+CELERY_BEAT_SCHEDULE = {
+    'poll-stock-prices': {
+        'task': 'portfolio_app.task.update_stock_prices_task',
+        'schedule': PRICE_POLLING['SESSION_INTERVAL'],
+        'kwargs': {'scheduled': True},
+        # A poll still queued when the next one is due is dropped
+        'options': {'expires': PRICE_POLLING['SESSION_INTERVAL']},
+    },
+    # Rollup cutoffs are hour-aligned, so running more often finds nothing new
+    'rollup-price-ticks': {
+        'task': 'portfolio_app.task.rollup_price_ticks_task',
+        'schedule': 60 * 60,
+    },
+    # Once a day, after the BVMT close (14:30 Africa/Tunis is 13:30 UTC)
+    'snapshot-portfolios': {
+        'task': 'portfolio_app.task.snapshot_portfolios_task',
+        'schedule': crontab(minute=0, hour=14),
+    },
+}
+
+# Market data feed used by update_stock_prices_task. Swap the backend for
+# portfolio_app.feeds.JsonFileFeed (OPTIONS: {'path': ...}) to replay a local fixture.
+# Scheduled polls call the backend's fetch_if_changed(validators).
+STOCK_FEED = {
+    'BACKEND': 'portfolio_app.feeds.HttpFeed',
+    'OPTIONS': {
+        'url': 'https://data.irbe7.com/api/data/principaux',
+        'timeout': (3.05, 10),
+    },
+}
+
+# Price ticks older than the given age are compacted to one open/high/low/close
+# set per bucket of that unit by rollup_price_ticks_task.
+PRICE_HISTORY_ROLLUP = {
+    'hour': {'days': 7},
+    'day': {'days': 90},
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Shared by every web and Celery process; use a LocMemCache alias in tests
+    'quotes': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/1',
+    },
+    # Revoked login sessions (portfolio_app.authentication), shared by every web process
+    'auth': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/2',
+    },
+}
+
+# Read-through quote cache (portfolio_app.quotes). LOCAL_TTL bounds how long a
+# process serves its in-memory snapshot before re-checking the shared version.
+QUOTE_CACHE = {
+    'ALIAS': 'quotes',
+    'LOCAL_TTL': 1.0,
+    'TIMEOUT': 24 * 60 * 60,
+}
+
+# Keyset pagination for transactions, news and users (portfolio_app.pagination);
+# clients may ask for ?page_size= up to MAX_PAGE_SIZE.
+API_PAGINATION = {
+    'PAGE_SIZE': 50,
+    'MAX_PAGE_SIZE': 200,
+}
+
+# Server-sent price stream (/api/async/stocks/stream/, ASGI only). Deltas are
+# published by update_stock_prices_task; portfolio_app.pubsub.InMemoryBroker
+# works when publisher and subscribers share one process, as in tests.
+PRICE_STREAM = {
+    'BACKEND': 'portfolio_app.pubsub.RedisBroker',
+    'OPTIONS': {'url': 'redis://localhost:6379/0'},
+    'COALESCE_INTERVAL': 1.0,  # seconds; clients may pass ?interval=
+    'KEEPALIVE': 15,
+}
+
+# Bearer token authentication (portfolio_app.authentication). Principals come
+# from the verified token claims and are cached per process for PRINCIPAL_TTL
+# seconds; a logout elsewhere is seen within REVOCATION_CHECK_TTL seconds.
+TOKEN_AUTH = {
+    'CACHE_ALIAS': 'auth',
+    'PRINCIPAL_TTL': 60,
+    'REVOCATION_CHECK_TTL': 1.0,
+}
+
+# Request/task latency, SQL and serializer timings (portfolio_app.metrics), served
+# at /metrics. Each process flushes its histograms to CACHE_ALIAS, which must be
+# shared by the web and Celery processes, every FLUSH_INTERVAL seconds. Set TOKEN
+# to require "Authorization: Bearer <token>" from the scraper.
+METRICS = {
+    'CACHE_ALIAS': 'quotes',
+    'FLUSH_INTERVAL': 10,
+    'SNAPSHOT_TTL': 300,
+    'SERVER_TIMING': True,
+    'TOKEN': None,
+}
+
+# Sampling profiler (portfolio_app.profiling). Staff sending "X-Profile: 1", and a
+# SAMPLE_RATE / TASK_SAMPLE_RATE fraction of requests and Celery tasks, get their
+# stack sampled every INTERVAL seconds. Flame-graph-ready files are kept in
+# DIRECTORY up to MAX_BYTES and listed at /api/profiles/.
+PROFILING = {
+    'HEADER': 'X-Profile',
+    'SAMPLE_RATE': 0.0,
+    'TASK_SAMPLE_RATE': 0.0,
+    'INTERVAL': 0.005,
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'MAX_BYTES': 50 * 1024 * 1024,
+}